@@ -0,0 +1,146 @@
+# coding: utf-8
+
+"""
+benchmark of the release manifest cache
+
+    python example/bench_manifest_cache.py [latency in ms] [rounds]
+
+serves a manifest shaped like the real latest-versions-per-milestone one
+from a local http.server, which waits `latency` ms (default 100) before
+answering every request, like a remote server would. then times
+Patcher.fetch_release_number() with
+
+    cold      an empty cache, the manifest is downloaded
+    warm      a cached manifest younger than manifest_ttl, no request
+    304       manifest_ttl=0, the cached manifest is revalidated (ETag)
+    offline   the server is gone, offline=True uses the cached manifest
+
+fails unless warm and offline made no requests at all, and every
+revalidation was answered by 304 Not Modified.
+"""
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from undetected_chromedriver.patcher import Patcher
+
+
+LATENCY = 0.1
+ROUNDS = 20
+VERSION = "120.0.6099.109"
+
+
+def make_manifest():
+    milestones = {}
+    for major in range(113, 150):
+        downloads = [
+            {
+                "platform": platform,
+                "url": "https://storage.googleapis.com/chrome-for-testing-public"
+                "/%d.0.0.0/%s/chromedriver-%s.zip" % (major, platform, platform),
+            }
+            for platform in ("linux64", "mac-arm64", "mac-x64", "win32", "win64")
+        ]
+        milestones[str(major)] = {
+            "milestone": str(major),
+            "version": VERSION if major == 120 else "%d.0.0.0" % major,
+            "revision": "1000000",
+            # the real manifest also lists chrome-headless-shell downloads,
+            # this only needs to be the same order of magnitude
+            "downloads": {"chrome": downloads * 8, "chromedriver": downloads},
+        }
+    return json.dumps({"timestamp": "2024-01-01T00:00:00Z", "milestones": milestones})
+
+
+class ManifestServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, body, latency):
+        super().__init__(("127.0.0.1", 0), ManifestHandler)
+        self.body = body.encode()
+        self.etag = '"%x"' % hash(body)
+        self.latency = latency
+        self.hits = {200: 0, 304: 0}
+
+
+class ManifestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        if self.headers.get("If-None-Match") == server.etag:
+            server.hits[304] += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        server.hits[200] += 1
+        self.send_response(200)
+        self.send_header("ETag", server.etag)
+        self.send_header("Content-Length", str(len(server.body)))
+        self.end_headers()
+        self.wfile.write(server.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(server, rounds, **kwargs):
+    """
+    :return: (ms per call, requests made) of fetch_release_number()
+    """
+    before = dict(server.hits)
+    patcher = Patcher(version_main=120, **kwargs)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if str(patcher.fetch_release_number()) != VERSION:
+            raise ValueError("wrong release number")
+    elapsed = (time.perf_counter() - start) / rounds * 1000
+    requests = {code: server.hits[code] - before[code] for code in before}
+    return elapsed, requests
+
+
+def main():
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else LATENCY
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else ROUNDS
+    Patcher.data_path = tempfile.mkdtemp(prefix="uc_bench_")
+    Patcher.manifest_path = os.path.join(Patcher.data_path, "manifests")
+
+    server = ManifestServer(make_manifest(), latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:%d" % server.server_port
+    print(
+        "manifest %dkB, latency %dms, %d rounds"
+        % (len(server.body) >> 10, latency * 1000, rounds)
+    )
+
+    results = [
+        ("cold", timed(server, 1, mirror_url=url)),
+        ("warm", timed(server, rounds, mirror_url=url)),
+        ("304", timed(server, rounds, mirror_url=url, manifest_ttl=0)),
+    ]
+    server.shutdown()
+    server.server_close()
+    results.append(("offline", timed(server, rounds, mirror_url=url, offline=True)))
+
+    for name, (elapsed, requests) in results:
+        print(
+            "%-8s %8.2fms per call   %3d x 200, %3d x 304"
+            % (name, elapsed, requests[200], requests[304])
+        )
+    requests = {name: requests for name, (_, requests) in results}
+    ok = (
+        requests["cold"] == {200: 1, 304: 0}
+        and requests["warm"] == {200: 0, 304: 0}
+        and requests["304"] == {200: 0, 304: rounds}
+        and requests["offline"] == {200: 0, 304: 0}
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
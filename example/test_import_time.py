@@ -0,0 +1,90 @@
+# coding: utf-8
+
+"""
+import time regression check
+
+    python example/test_import_time.py [budget in ms]
+
+measures the time `import undetected_chromedriver` takes on top of the
+selenium modules it needs anyway (best of a few runs, each in a fresh
+interpreter using -X importtime), and fails when it exceeds the budget,
+or when modules which are supposed to load lazily got imported.
+"""
+
+import subprocess
+import sys
+
+
+RUNS = 5
+BUDGET_MS = 25
+
+# must not be imported by `import undetected_chromedriver`
+LAZY = (
+    "undetected_chromedriver.cdp",
+    "undetected_chromedriver.reactor",
+    "undetected_chromedriver.patcher",
+    "undetected_chromedriver.dprocess",
+    "requests",
+    "websockets",
+)
+
+
+def own_import_time():
+    """
+    :return: microseconds spent importing undetected_chromedriver,
+             excluding the selenium modules it imports directly
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import undetected_chromedriver"],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(cumulative)))
+    # children are listed before their parent
+    for i, (depth, name, cumulative) in enumerate(rows):
+        if name == "undetected_chromedriver":
+            break
+    else:
+        raise RuntimeError("undetected_chromedriver was not imported")
+    total = cumulative
+    for child_depth, child, child_cumulative in reversed(rows[:i]):
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 1 and child.startswith("selenium"):
+            total -= child_cumulative
+    return total
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    check = (
+        "import sys, undetected_chromedriver;"
+        "print(' '.join(m for m in %r if m in sys.modules))" % (LAZY,)
+    )
+    eager = subprocess.run(
+        [sys.executable, "-c", check],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout.split()
+    best = min(own_import_time() for _ in range(RUNS)) / 1000
+    print("import undetected_chromedriver: %.1fms (budget %.1fms)" % (best, budget))
+    failed = False
+    if eager:
+        print("imported eagerly: %s" % ", ".join(eager))
+        failed = True
+    if best > budget:
+        print("over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
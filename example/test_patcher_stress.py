@@ -0,0 +1,99 @@
+# coding: utf-8
+
+"""
+multi process stress test of the driver cache
+
+    python example/test_patcher_stress.py [processes]
+
+starts 50 processes at once, all calling Patcher.auto() for the same driver
+version on an empty cache, in a temporary data folder. the download is
+replaced by a local fake driver (taking half a second to "download"), so
+this runs offline.
+
+fails unless every process ends up with its own patched binary, and the
+driver was downloaded exactly once.
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+from packaging.version import Version
+
+from undetected_chromedriver.patcher import Patcher
+
+
+PROCESSES = 50
+VERSION = "120.0.6099.109"
+
+
+class StressPatcher(Patcher):
+    def fetch_release_number(self):
+        return Version(VERSION)
+
+    def fetch_package(self):
+        # one line per download
+        with open(os.path.join(self.data_path, "downloads"), "a") as f:
+            f.write("%d\n" % os.getpid())
+        time.sleep(0.5)
+        fp = os.path.join(self.data_path, "%d.zip" % os.getpid())
+        body = (
+            os.urandom(1 << 16)
+            + b"{window.cdc_adoQpoasnfa76pfcZLmcfl_Array = window.Array;}"
+            + os.urandom(1 << 16)
+        )
+        with zipfile.ZipFile(fp, "w") as zf:
+            member = "chromedriver-%s/%s" % (self.platform_name, self.exe_name)
+            zf.writestr(member, body)
+        return fp
+
+
+def worker(data_path, barrier, results):
+    StressPatcher.data_path = data_path
+    StressPatcher.cache_path = os.path.join(data_path, "cache")
+    StressPatcher.manifest_path = os.path.join(data_path, "manifests")
+    StressPatcher.janitor_interval = None
+    barrier.wait()
+    start = time.perf_counter()
+    try:
+        patcher = StressPatcher(version_main=int(VERSION.split(".")[0]))
+        ok = bool(patcher.auto()) and patcher.is_binary_patched()
+        results.put((ok, time.perf_counter() - start, patcher.executable_path))
+    except Exception as e:
+        results.put((False, time.perf_counter() - start, repr(e)))
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else PROCESSES
+    data_path = tempfile.mkdtemp(prefix="uc_stress_")
+    barrier = multiprocessing.Barrier(processes)
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=worker, args=(data_path, barrier, results))
+        for _ in range(processes)
+    ]
+    for proc in procs:
+        proc.start()
+    done = [results.get(timeout=120) for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    with open(os.path.join(data_path, "downloads")) as f:
+        downloads = len(f.read().split())
+    ok = sum(1 for result in done if result[0])
+    paths = len({result[2] for result in done if result[0]})
+    print(
+        "%d processes: %d ok, %d distinct binaries, %d download(s), slowest %.2fs"
+        % (processes, ok, paths, downloads, max(result[1] for result in done))
+    )
+    for result in done:
+        if not result[0]:
+            print("failed: %s" % result[2])
+    return 0 if ok == paths == processes and downloads == 1 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,12 +19,10 @@ from __future__ import annotations
 
 __version__ = "3.5.5"
 
-import json
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import os
-import pathlib
 import re
-import shutil
 import subprocess
 import sys
 import tempfile
@@ -38,12 +36,14 @@ import selenium.webdriver.chromium.service
 import selenium.webdriver.remote.command
 import selenium.webdriver.remote.webdriver
 
-from .cdp import CDP
-from .dprocess import start_detached
 from .options import ChromeOptions
-from .patcher import IS_POSIX
-from .patcher import Patcher
-from .reactor import Reactor
+from .pool import BrowserPool
+from .profiles import clone_profile
+from .profiles import create_profile_template
+from .profiles import fix_exit_type
+from .profiling import StartupProfile
+from .readiness import wait_for_browser
+from .readiness import wait_for_service
 from .webelement import UCWebElement
 from .webelement import WebElement
 
@@ -52,14 +52,43 @@ __all__ = (
     "Chrome",
     "ChromeOptions",
     "Patcher",
+    "BrowserPool",
     "Reactor",
     "CDP",
+    "CDPDriver",
+    "StartupProfile",
+    "create_profile_template",
     "find_chrome_executable",
 )
 
 logger = logging.getLogger("uc")
 logger.setLevel(logging.getLogger().getEffectiveLevel())
 
+IS_POSIX = sys.platform.startswith(("darwin", "cygwin", "linux", "linux2"))
+
+# these pull in requests, websockets, asyncio, zipfile, urllib and packaging,
+# which many processes never need. they are imported on first access
+_LAZY = {
+    "CDP": ".cdp",
+    "CDPDriver": ".cdpdriver",
+    "Reactor": ".reactor",
+    "Patcher": ".patcher",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
 
 class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
     """
@@ -101,6 +130,9 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
     _instances = set()
     session_id = None
     debug = False
+    _devtools = None
+    # seconds to wait at most for the browser and driver to become ready
+    ready_timeout = 30
 
     def __init__(
         self,
@@ -125,6 +157,8 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
         debug=False,
         no_sandbox=True,
         user_multi_procs: bool = False,
+        startup_profile_hook=None,
+        profile_template=None,
         **kw,
     ):
         """
@@ -163,6 +197,12 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
 
                 driver.add_cdp_listener("Network.dataReceived", yourcallback)
                 # yourcallback is an callable which accepts exactly 1 dict as parameter
+                driver.add_cdp_listener("Network.*", othercallback)
+                # all events of a domain. an event can have several listeners
+
+            events are streamed over the devtools websocket of the browser as they
+            happen, and only the domains you listen to are enabled. set
+            uc.Reactor.push = False to poll the performance log of chromedriver instead.
 
 
         service_args: list of str, optional, default: None
@@ -201,6 +241,8 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
             if you, for god knows whatever reason, use
             an older version of Chrome. You can specify it's full rounded version number
             here. Example: 87 for all versions of 87
+            when not specified, the version of the browser executable is detected
+            locally, so the downloaded driver always matches the installed browser.
 
         patcher_force_close: bool, optional, default: False
             instructs the patcher to do whatever it can to access the chromedriver binary
@@ -240,24 +282,28 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
         user_multi_procs:
             set to true when you are using multithreads/multiprocessing
             ensures not all processes are trying to modify a binary which is in use by another.
-            for this to work. YOU MUST HAVE AT LEAST 1 UNDETECTED_CHROMEDRIVER BINARY IN YOUR ROAMING DATA FOLDER.
-            this requirement can be easily satisfied, by just running this program "normal" and close/kill it.
+            when set, the most recent patched binary from the driver cache in your roaming data folder
+            is reused without checking for a newer version online.
+            the cache can be filled by just running this program "normal" once.
+
+        startup_profile_hook: callable, optional, default: None
+            called with the StartupProfile once the driver has started.
+            the profile, which holds the time taken by each startup phase,
+            is available as `driver.startup_profile` as well.
+
+        profile_template: str, optional, default: None
+            path to a profile template (see create_profile_template).
+            when no user_data_dir is given, the temporary profile is cloned from it,
+            instead of starting with an empty one on which the browser has to do its
+            first run setup.
 
 
         """
 
         finalize(self, self._ensure_close, self)
+        self.startup_profile = StartupProfile()
         self.debug = debug
-        self.patcher = Patcher(
-            executable_path=driver_executable_path,
-            force=patcher_force_close,
-            version_main=version_main,
-            user_multi_procs=user_multi_procs,
-        )
-        # self.patcher.auto(user_multiprocess = user_multi_num_procs)
-        self.patcher.auto()
 
-        # self.patcher = patcher
         if not options:
             options = ChromeOptions()
 
@@ -272,6 +318,47 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
 
         options._session = self
 
+        from .launchplan import LaunchPlan
+
+        # the browser executable, its version and the default language are
+        # resolved once, and reused until the browser binary changes
+        self.launch_plan = LaunchPlan.get(
+            options.binary_location or browser_executable_path
+        )
+        if self.launch_plan:
+            options.binary_location = self.launch_plan.browser_path
+        else:
+            raise FileNotFoundError(
+                "\n---------------------\n"
+                "Could not determine browser executable."
+                "\n---------------------\n"
+                "Make sure your browser is installed in the default location (path).\n"
+                "If you are sure about the browser executable, you can specify it using\n"
+                "the `browser_executable_path='{}` parameter.\n\n"
+                .format("/path/to/browser/executable" if IS_POSIX else "c:/path/to/your/browser.exe")
+            )
+
+        self.startup_profile.lap("find_browser")
+
+        # the browser is known before patching, so the patcher can pick
+        # the driver matching the installed browser version
+        from .patcher import Patcher
+
+        self.patcher = Patcher(
+            executable_path=driver_executable_path,
+            force=patcher_force_close,
+            version_main=version_main or self.launch_plan.version_main,
+            user_multi_procs=user_multi_procs,
+            browser_executable_path=options.binary_location,
+        )
+        # the driver binary is only needed once the service starts. resolving
+        # (and possibly downloading and patching) it runs in the background,
+        # while the options are prepared and the browser boots
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="uc-patcher")
+        patching = executor.submit(self._run_patcher)
+        executor.shutdown(wait=False)
+        self.startup_profile.lap("patcher")
+
         if not options.debugger_address:
             debug_port = (
                 port
@@ -285,9 +372,14 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
             debug_port = int(debug_port)
 
         if enable_cdp_events:
-            options.set_capability(
-                "goog:loggingPrefs", {"performance": "ALL", "browser": "ALL"}
-            )
+            from .reactor import Reactor
+
+            logging_prefs = {"browser": "ALL"}
+            if not Reactor.push:
+                # events are streamed over devtools otherwise, and nobody
+                # would drain chromedriver's buffer of them
+                logging_prefs["performance"] = "ALL"
+            options.set_capability("goog:loggingPrefs", logging_prefs)
 
         options.add_argument("--remote-debugging-host=%s" % debug_host)
         options.add_argument("--remote-debugging-port=%s" % debug_port)
@@ -327,6 +419,8 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
                         % arg
                     )
 
+        self.startup_profile.lap("options")
+
         if not user_data_dir:
             # backward compatiblity
             # check if an old uc.ChromeOptions is used, and extract the user data dir
@@ -347,7 +441,10 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
                 )
 
             else:
-                user_data_dir = os.path.normpath(tempfile.mkdtemp())
+                if profile_template:
+                    user_data_dir = clone_profile(profile_template)
+                else:
+                    user_data_dir = os.path.normpath(tempfile.mkdtemp())
                 keep_user_data_dir = False
                 arg = "--user-data-dir=%s" % user_data_dir
                 options.add_argument(arg)
@@ -356,37 +453,13 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
                     "session, and added it to chrome startup arguments: %s" % arg
                 )
 
-        if not language:
-            try:
-                import locale
+        self.startup_profile.lap("profile")
 
-                language = locale.getdefaultlocale()[0].replace("_", "-")
-            except Exception:
-                pass
-            if not language:
-                language = "en-US"
+        if not language:
+            language = self.launch_plan.language
 
         options.add_argument("--lang=%s" % language)
 
-        if not options.binary_location:
-            options.binary_location = (
-                browser_executable_path or find_chrome_executable()
-            )
-
-        if not options.binary_location or not \
-                pathlib.Path(options.binary_location).exists():
-                raise FileNotFoundError(
-                    "\n---------------------\n"
-                    "Could not determine browser executable."
-                    "\n---------------------\n"
-                    "Make sure your browser is installed in the default location (path).\n"
-                    "If you are sure about the browser executable, you can specify it using\n"
-                    "the `browser_executable_path='{}` parameter.\n\n"
-                    .format("/path/to/browser/executable" if IS_POSIX else "c:/path/to/your/browser.exe")
-                )
-
-        self._delay = 3
-
         self.user_data_dir = user_data_dir
         self.keep_user_data_dir = keep_user_data_dir
 
@@ -397,6 +470,9 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
 
         if headless or getattr(options, 'headless', None):
             #workaround until a better checking is found
+            if not self.patcher.version_main:
+                # not detected locally, the patcher resolves it
+                patching.result()
             try:
                 if self.patcher.version_main < 108:
                     options.add_argument("--headless=chrome")
@@ -418,33 +494,26 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
             or divmod(logging.getLogger().getEffectiveLevel(), 10)[0]
         )
 
+        self.startup_profile.lap("options")
+
+        # merges the prefs and fixes the exit_type flag to prevent the
+        # tab-restore nag, with a single write of the Preferences file
         if hasattr(options, "handle_prefs"):
-            options.handle_prefs(user_data_dir)
+            options.handle_prefs(user_data_dir, fix_exit_type=True)
+        else:
+            fix_exit_type(user_data_dir)
 
-        # fix exit_type flag to prevent tab-restore nag
-        try:
-            with open(
-                os.path.join(user_data_dir, "Default/Preferences"),
-                encoding="latin1",
-                mode="r+",
-            ) as fs:
-                config = json.load(fs)
-                if config["profile"]["exit_type"] is not None:
-                    # fixing the restore-tabs-nag
-                    config["profile"]["exit_type"] = None
-                fs.seek(0, 0)
-                json.dump(config, fs)
-                fs.truncate()  # the file might be shorter
-                logger.debug("fixed exit_type flag")
-        except Exception as e:
-            logger.debug("did not find a bad exit_type flag ")
+        self.startup_profile.lap("prefs")
 
         self.options = options
 
         if not desired_capabilities:
             desired_capabilities = options.to_capabilities()
+        self.startup_profile.lap("options")
 
         if not use_subprocess:
+            from .dprocess import start_detached
+
             self.browser_pid = start_detached(
                 options.binary_location, *options.arguments
             )
@@ -457,7 +526,16 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
                 close_fds=IS_POSIX,
             )
             self.browser_pid = browser.pid
+        self._browser_launched = time.perf_counter()
+        self.startup_profile.lap("browser_launch")
 
+        # join point: the service needs the driver binary
+        try:
+            self.startup_profile.add("patcher_auto", patching.result())
+        except BaseException:
+            self.quit()
+            raise
+        self.startup_profile.lap("patcher_join")
 
         service = selenium.webdriver.chromium.service.ChromiumService(
             self.patcher.executable_path
@@ -476,6 +554,8 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
                 logging.getLogger(
                     "selenium.webdriver.remote.remote_connection"
                 ).setLevel(20)
+            from .reactor import Reactor
+
             reactor = Reactor(self)
             reactor.start()
             self.reactor = reactor
@@ -488,6 +568,15 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
         if headless or getattr(options, 'headless', None):
             self._configure_headless()
 
+        self.startup_profile.lap("finalize")
+        self.startup_profile.finish(startup_profile_hook)
+
+    def _run_patcher(self):
+        start = time.perf_counter()
+        # self.patcher.auto(user_multiprocess = user_multi_num_procs)
+        self.patcher.auto()
+        return time.perf_counter() - start
+
     def _configure_headless(self):
         orig_get = self.get
         logger.info("setting properties for headless")
@@ -664,19 +753,30 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
         #     self._hook_remove_cdc_props()
         return super().get(url)
 
-    def add_cdp_listener(self, event_name, callback):
+    def add_cdp_listener(self, event_name, callback, predicate=None):
+        from .reactor import Reactor
+
         if (
             self.reactor
             and self.reactor is not None
             and isinstance(self.reactor, Reactor)
         ):
-            self.reactor.add_event_handler(event_name, callback)
+            self.reactor.add_event_handler(event_name, callback, predicate)
             return self.reactor.handlers
         return False
 
+    def remove_cdp_listener(self, event_name, callback):
+        from .reactor import Reactor
+
+        if self.reactor and isinstance(self.reactor, Reactor):
+            return self.reactor.remove_event_handler(event_name, callback)
+        return False
+
     def clear_cdp_listeners(self):
+        from .reactor import Reactor
+
         if self.reactor and isinstance(self.reactor, Reactor):
-            self.reactor.handlers.clear()
+            self.reactor.clear_event_handlers()
 
     def window_new(self):
         self.execute(
@@ -702,16 +802,52 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
             cdp = CDP(self.options)
             cdp.tab_new(url)
 
-    def reconnect(self, timeout=0.1):
+    @property
+    def devtools(self):
+        """
+        a devtools connection to the browser itself (see connection.Connection),
+        shared by the tabs opened using open_tabs
+        """
+        if self._devtools is None or self._devtools.closed:
+            from .connection import Connection
+            from .readiness import fetch_json
+
+            version = fetch_json(
+                "http://%s/json/version" % self.options.debugger_address
+            )
+            self._devtools = Connection(version["webSocketDebuggerUrl"])
+        return self._devtools
+
+    def open_tabs(self, count, url=None):
+        """
+        opens count new tabs, each driven over its own devtools session
+        instead of through chromedriver, so they can be used concurrently
+        from threads or asyncio. see cdpdriver.Tab for what they can do.
+
+        :return: list of cdpdriver.Tab
+        """
+        from .cdpdriver import open_tabs
+
+        return open_tabs(self.devtools, count, url)
+
+    def reconnect(self, timeout=None):
+        """
+        restarts the driver service and its session, the browser keeps running.
+
+        Parameters
+        ----------
+        timeout: float, optional, default: None (= ready_timeout)
+            seconds to wait at most for the browser and driver to be ready
+        """
         try:
             self.service.stop()
         except Exception as e:
             logger.debug(e)
-        time.sleep(timeout)
         try:
             self.service.start()
         except Exception as e:
             logger.debug(e)
+        self._wait_ready(timeout)
 
         try:
             self.start_session()
@@ -719,11 +855,46 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
             logger.debug(e)
 
     def start_session(self, capabilities=None, browser_profile=None):
+        profile = getattr(self, "startup_profile", None)
+        if profile and not profile.finished:
+            # called from super().__init__, right after starting the service
+            profile.lap("service_start")
+            self._wait_ready()
+            profile.lap("readiness")
         if not capabilities:
             capabilities = self.options.to_capabilities()
         super().start_session(capabilities)
+        if profile and not profile.finished:
+            profile.lap("session")
         # super(Chrome, self).start_session(capabilities, browser_profile) # Original explicit call commented out
 
+    def _wait_ready(self, timeout=None):
+        """
+        polls the browser's devtools endpoint and the driver's status until both
+        answer. while starting up, the latencies are recorded in the startup profile
+        as browser_ready (since launching the browser) and service_ready.
+        """
+        timeout = timeout or self.ready_timeout
+        profile = getattr(self, "startup_profile", None)
+        if profile and profile.finished:
+            profile = None
+        try:
+            wait_for_browser(self.options.debugger_address, timeout)
+            if profile and hasattr(self, "_browser_launched"):
+                profile.add(
+                    "browser_ready", time.perf_counter() - self._browser_launched
+                )
+            process = self.service.process
+            waited = wait_for_service(
+                self.service.service_url,
+                timeout,
+                alive=lambda: process is None or process.poll() is None,
+            )
+            if profile:
+                profile.add("service_ready", waited)
+        except (TimeoutError, RuntimeError) as e:
+            logger.warning("%s, continuing anyway" % e)
+
     def find_elements_recursive(self, by, value):
         """
         find elements in all frames
@@ -759,41 +930,52 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
             for elem in search_frame(f):
                 yield elem
 
-    def quit(self):
+    def quit(self, wait=True):
+        """
+        quits the driver and the browser, and removes the temporary profile.
+
+        Parameters
+        ----------
+        wait: bool, optional, default: True
+            when False, waiting for the browser to exit and removing the
+            profile is left to a background thread, and quit returns right
+            after signalling the processes.
+        """
         try:
             self.service.process.kill()
             logger.debug("webdriver process ended")
         except (AttributeError, RuntimeError, OSError):
             pass
         try:
-            self.reactor.event.set()
+            self.reactor.stop()
             logger.debug("shutting down reactor")
         except AttributeError:
             pass
+        if self._devtools is not None:
+            self._devtools.close()
         try:
             os.kill(self.browser_pid, 15)
             logger.debug("gracefully closed browser")
         except Exception as e:  # noqa
             pass
-        if (
+        remove = (
             hasattr(self, "keep_user_data_dir")
             and hasattr(self, "user_data_dir")
             and not self.keep_user_data_dir
-        ):
-            for _ in range(5):
-                try:
-                    shutil.rmtree(self.user_data_dir, ignore_errors=False)
-                except FileNotFoundError:
-                    pass
-                except (RuntimeError, OSError, PermissionError) as e:
-                    logger.debug(
-                        "When removing the temp profile, a %s occured: %s\nretrying..."
-                        % (e.__class__.__name__, e)
-                    )
-                else:
-                    logger.debug("successfully removed %s" % self.user_data_dir)
-                    break
-                time.sleep(0.1)
+        )
+        if not wait:
+            from .reaper import reaper
+
+            reaper.submit(
+                getattr(self, "browser_pid", None),
+                self.user_data_dir if remove else None,
+            )
+            # it is taken care of now
+            self.keep_user_data_dir = True
+        elif remove:
+            from .reaper import remove_profile
+
+            remove_profile(self.user_data_dir)
 
         # dereference patcher, so patcher can start cleaning up as well.
         # this must come last, otherwise it will throw 'in use' errors
@@ -823,8 +1005,8 @@ class Chrome(selenium.webdriver.chrome.webdriver.WebDriver):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.service.stop()
-        time.sleep(self._delay)
         self.service.start()
+        self._wait_ready()
         self.start_session()
 
     def __hash__(self):
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# this module is part of undetected_chromedriver
+
+"""
+manages the patched driver cache, for example to populate it while baking images
+
+    python -m undetected_chromedriver prefetch 120 121 122 --platforms linux64 win64
+    python -m undetected_chromedriver list
+    python -m undetected_chromedriver verify
+    python -m undetected_chromedriver gc --keep 3 --max-size 500M
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import logging
+import os
+import sys
+import time
+
+from packaging.version import Version as LooseVersion
+
+from . import find_chrome_executable
+from .patcher import PATCH_REVISION
+from .patcher import Patcher
+
+
+def _prefetch_one(spec, platform_name, args):
+    """
+    makes sure the driver for version spec (a major version, a full version,
+    or None for the version of the installed browser) is in the cache
+
+    :return: (version, platform_name, seconds taken, cache hit)
+    """
+    start = time.perf_counter()
+    release, version_main = None, 0
+    if spec:
+        if "." in spec:
+            release = LooseVersion(spec)
+            version_main = release.release[0]
+        else:
+            version_main = int(spec)
+    patcher = Patcher(
+        version_main=version_main,
+        mirror_url=args.mirror,
+        offline=args.offline or None,
+        platform_name=platform_name,
+        browser_executable_path=None if spec else find_chrome_executable(),
+    )
+    if release is None:
+        release = patcher.resolve_release()
+    hit = os.path.isfile(patcher.cached_binary_path(release))
+    patcher.ensure_cached(release)
+    return release, patcher.platform_name, time.perf_counter() - start, hit
+
+
+def prefetch(args):
+    platforms = args.platforms or [None]
+    jobs = list(itertools.product(args.versions or [None], platforms))
+    failed = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(_prefetch_one, spec, plat, args) for spec, plat in jobs]
+        for (spec, plat), future in zip(jobs, futures):
+            try:
+                release, platform_name, took, hit = future.result()
+            except Exception as e:
+                failed += 1
+                print(
+                    "%-16s %-10s FAILED: %s"
+                    % (spec or "browser", plat or "host", e),
+                    file=sys.stderr,
+                )
+                continue
+            print(
+                "%-16s %-10s %6.2fs %s"
+                % (release, platform_name, took, "cached" if hit else "fetched")
+            )
+    print("done in %.2fs" % (time.perf_counter() - start))
+    return 1 if failed else 0
+
+
+def list_(args):
+    entries = sorted(
+        Patcher.iter_cache(), key=lambda e: (e.platform_name, e.version)
+    )
+    for entry in entries:
+        try:
+            st = os.stat(entry.exe_path)
+        except OSError:
+            size, mtime = "-", "missing"
+        else:
+            size = "%.1fM" % (st.st_size / 1024 / 1024)
+            mtime = time.strftime("%Y-%m-%d %H:%M", time.localtime(st.st_mtime))
+        print(
+            "%-16s %-10s r%-3d %7s  %s%s"
+            % (
+                entry.version,
+                entry.platform_name,
+                entry.revision,
+                size,
+                mtime,
+                "" if entry.revision == PATCH_REVISION else "  (outdated)",
+            )
+        )
+    return 0
+
+
+def verify(args):
+    patcher = Patcher()
+    failed = 0
+    for entry in Patcher.iter_cache():
+        if entry.revision != PATCH_REVISION:
+            continue
+        if not os.path.isfile(entry.exe_path):
+            problem = "missing binary"
+        elif not patcher.is_binary_patched(entry.exe_path, thorough=True):
+            problem = "not patched"
+        else:
+            print("%-16s %-10s ok" % (entry.version, entry.platform_name))
+            continue
+        failed += 1
+        if args.remove and Patcher.remove_cached(entry):
+            problem += ", removed"
+        print("%-16s %-10s %s" % (entry.version, entry.platform_name, problem))
+    return 1 if failed else 0
+
+
+def _size(value):
+    """parses a size like 500M or 2G into bytes"""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    value = value.strip().upper().rstrip("B")
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def gc(args):
+    for path in Patcher.janitor(max_size=args.max_size, keep=args.keep):
+        print("removed %s" % path)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m undetected_chromedriver",
+        description="manage the patched chromedriver cache in %s" % Patcher.data_path,
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("prefetch", help="fetch and patch drivers into the cache")
+    p.add_argument(
+        "versions",
+        nargs="*",
+        help="major (ex: 120) or full versions. default: the installed browser's",
+    )
+    p.add_argument(
+        "--platforms",
+        nargs="+",
+        metavar="PLATFORM",
+        help="ex: linux64 mac-x64 mac-arm64 win32 win64. default: this host's",
+    )
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--mirror", help="base url of a mirror, see Patcher.mirror_url")
+    p.add_argument(
+        "--offline", action="store_true", help="only use cached release manifests"
+    )
+    p.set_defaults(func=prefetch)
+
+    p = commands.add_parser("list", help="list the cached drivers")
+    p.set_defaults(func=list_)
+
+    p = commands.add_parser(
+        "verify", help="check the cached drivers are patched, reading their bytes"
+    )
+    p.add_argument("--remove", action="store_true", help="remove broken entries")
+    p.set_defaults(func=verify)
+
+    p = commands.add_parser("gc", help="remove what is not needed anymore")
+    p.add_argument(
+        "--keep",
+        type=int,
+        help="number of newest driver versions to keep per platform",
+    )
+    p.add_argument(
+        "--max-size",
+        type=_size,
+        help="evict least recently used drivers beyond this size, ex: 500M. "
+        "default: Patcher.cache_max_size",
+    )
+    p.set_defaults(func=gc)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
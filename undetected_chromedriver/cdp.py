@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 # this module is part of undetected_chromedriver
 
-import json
+import asyncio
 import logging
 
 import requests
-import websockets
+
+from .connection import Connection
 
 
 log = logging.getLogger(__name__)
@@ -51,6 +52,8 @@ class CDP:
 
         self._reqid = 0
         self._session = requests.Session()
+        # {websocket url: Connection}, one long-lived connection per target
+        self._connections = {}
         self._last_resp = None
         self._last_json = None
 
@@ -77,15 +80,47 @@ class CDP:
         opentabs = [s for s in sessions if s["type"] == "page"]
         return self.post(self.endpoints["close"].format(id=opentabs[-1]["id"]))
 
-    async def send(self, method: str, params: dict):
-        self._reqid += 1
-        async with websockets.connect(self.wsurl) as ws:
-            await ws.send(
-                json.dumps({"method": method, "params": params, "id": self._reqid})
-            )
-            self._last_resp = await ws.recv()
-            self._last_json = json.loads(self._last_resp)
-            self.log.info(self._last_json)
+    @property
+    def connection(self):
+        """the (persistent) devtools connection to the current target"""
+        connection = self._connections.get(self.wsurl)
+        if connection is None or connection.closed:
+            connection = self._connections[self.wsurl] = Connection(self.wsurl)
+        return connection
+
+    async def send(self, method: str, params: dict = None, timeout: float = None):
+        """
+        sends a command to the current target, and returns its result.
+        any number of commands can be in flight at once over the same connection.
+
+        :raises connection.CDPError: when the browser answers with an error
+        :raises TimeoutError: no response within timeout (None = Connection.timeout)
+        """
+        connection = self.connection
+        if timeout is None:
+            timeout = connection.timeout
+        future = connection.submit(method, params)
+        self._reqid = future.cmd_id
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            connection.forget(future)
+            raise TimeoutError(
+                "%s got no response within %s seconds" % (method, timeout)
+            ) from None
+        self._last_resp = self._last_json = {"id": future.cmd_id, "result": result}
+        self.log.debug(self._last_json)
+        return result
+
+    def add_listener(self, method, callback):
+        """calls callback(message) for every event named method of the current target"""
+        self.connection.add_listener(method, callback)
+
+    def close(self):
+        """closes the devtools connections"""
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
 
     def get(self, uri):
         resp = self._session.get(self.server_addr + uri)
@@ -0,0 +1,845 @@
+#!/usr/bin/env python3
+# this module is part of undetected_chromedriver
+
+"""
+a driver which talks to the browser over devtools only, without chromedriver.
+
+    driver = uc.CDPDriver(headless=True)
+    driver.get("https://nowsecure.nl")
+    print(driver.find_element(By.CSS_SELECTOR, "h1").text)
+    driver.quit()
+
+the browser is launched the same way uc.Chrome does, but there is no driver
+binary to patch and no driver process to start, and every command goes straight
+to the browser over one persistent websocket instead of through an http hop.
+
+only the commonly used part of the webdriver api is provided (see Tab and
+CDPElement), anything else can be done with execute_cdp_cmd.
+
+any number of tabs can be driven concurrently, from threads or asyncio,
+each over its own session of the same connection:
+
+    tabs = driver.open_tabs(10)
+    async def visit(tab, url):
+        await tab.get_async(url)
+        return await tab.evaluate_async("document.title")
+    titles = await asyncio.gather(*map(visit, tabs, urls))
+"""
+
+import asyncio
+import base64
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import time
+
+from selenium.common.exceptions import JavascriptException
+from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.common.utils import free_port
+
+from . import IS_POSIX
+from .connection import CDPError
+from .connection import Connection
+from .launchplan import LaunchPlan
+from .options import ChromeOptions
+from .profiles import clone_profile
+from .profiles import fix_exit_type
+from .profiling import StartupProfile
+from .readiness import fetch_json
+from .readiness import wait_for_browser
+
+
+logger = logging.getLogger(__name__)
+
+# called with `this` being the document or an element to search in
+_FIND = """function(by, value, first) {
+    var root = this, found;
+    switch (by) {
+        case "css selector":
+            found = first ? [root.querySelector(value)] : root.querySelectorAll(value);
+            break;
+        case "id":
+            found = root.querySelectorAll("#" + CSS.escape(value));
+            break;
+        case "name":
+            found = root.querySelectorAll('[name="' + CSS.escape(value) + '"]');
+            break;
+        case "class name":
+            found = root.querySelectorAll("." + CSS.escape(value));
+            break;
+        case "tag name":
+            found = root.getElementsByTagName(value);
+            break;
+        case "link text":
+        case "partial link text":
+            found = Array.prototype.filter.call(root.querySelectorAll("a"), function(a) {
+                var text = a.innerText.trim();
+                return by == "link text" ? text == value : text.indexOf(value) > -1;
+            });
+            break;
+        case "xpath":
+            var result = document.evaluate(
+                value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+            );
+            found = [];
+            for (var i = 0; i < result.snapshotLength; i++) {
+                found.push(result.snapshotItem(i));
+            }
+            break;
+        default:
+            throw new Error("unsupported locator strategy " + by);
+    }
+    found = Array.prototype.filter.call(found, function(e) { return e; });
+    return first ? found[0] || null : found;
+}"""
+
+# selenium key => (key, windowsVirtualKeyCode, text)
+_KEYS = {
+    Keys.ENTER: ("Enter", 13, "\r"),
+    Keys.RETURN: ("Enter", 13, "\r"),
+    Keys.TAB: ("Tab", 9, ""),
+    Keys.BACKSPACE: ("Backspace", 8, ""),
+    Keys.ESCAPE: ("Escape", 27, ""),
+    Keys.DELETE: ("Delete", 46, ""),
+    Keys.LEFT: ("ArrowLeft", 37, ""),
+    Keys.UP: ("ArrowUp", 38, ""),
+    Keys.RIGHT: ("ArrowRight", 39, ""),
+    Keys.DOWN: ("ArrowDown", 40, ""),
+}
+
+
+class CDPElement(object):
+    """a handle to a dom node in a Tab"""
+
+    def __init__(self, tab, object_id):
+        self.tab = tab
+        self.object_id = object_id
+
+    def _call(self, function, *args):
+        return self.tab._call(self.object_id, function, *args)
+
+    @property
+    def text(self):
+        return self._call("function() { return this.innerText; }")
+
+    @property
+    def tag_name(self):
+        return self._call("function() { return this.tagName.toLowerCase(); }")
+
+    @property
+    def rect(self):
+        return self._call(
+            """function() {
+                var r = this.getBoundingClientRect();
+                return {x: r.left + scrollX, y: r.top + scrollY, width: r.width, height: r.height};
+            }"""
+        )
+
+    @property
+    def location(self):
+        rect = self.rect
+        return {"x": rect["x"], "y": rect["y"]}
+
+    @property
+    def size(self):
+        rect = self.rect
+        return {"width": rect["width"], "height": rect["height"]}
+
+    def get_attribute(self, name):
+        return self._call("function(name) { return this.getAttribute(name); }", name)
+
+    def get_property(self, name):
+        return self._call("function(name) { return this[name]; }", name)
+
+    def is_displayed(self):
+        return self._call(
+            """function() {
+                var style = getComputedStyle(this);
+                return style.visibility != "hidden" && style.display != "none"
+                    && this.getClientRects().length > 0;
+            }"""
+        )
+
+    def is_enabled(self):
+        return self._call("function() { return !this.disabled; }")
+
+    def is_selected(self):
+        return self._call("function() { return !!(this.checked || this.selected); }")
+
+    def click(self):
+        x, y = self._call(
+            """function() {
+                this.scrollIntoView({block: "center", inline: "center"});
+                var r = this.getBoundingClientRect();
+                return [r.left + r.width / 2, r.top + r.height / 2];
+            }"""
+        )
+        for event in ("mouseMoved", "mousePressed", "mouseReleased"):
+            self.tab.send(
+                "Input.dispatchMouseEvent",
+                {
+                    "type": event,
+                    "x": x,
+                    "y": y,
+                    "button": "none" if event == "mouseMoved" else "left",
+                    "clickCount": 1,
+                },
+            )
+
+    def send_keys(self, *value):
+        self._call("function() { this.focus(); }")
+        text = "".join(str(v) for v in value)
+        # plain text goes in at once, special keys are pressed one by one
+        for part in re.split("([%s])" % "".join(_KEYS), text):
+            if not part:
+                continue
+            if part not in _KEYS:
+                self.tab.send("Input.insertText", {"text": part})
+                continue
+            key, code, key_text = _KEYS[part]
+            params = {"key": key, "code": key, "windowsVirtualKeyCode": code}
+            if key_text:
+                params["text"] = key_text
+            self.tab.send(
+                "Input.dispatchKeyEvent",
+                dict(params, type="keyDown" if key_text else "rawKeyDown"),
+            )
+            self.tab.send("Input.dispatchKeyEvent", dict(params, type="keyUp"))
+
+    def clear(self):
+        self._call(
+            """function() {
+                this.value = "";
+                this.dispatchEvent(new Event("input", {bubbles: true}));
+                this.dispatchEvent(new Event("change", {bubbles: true}));
+            }"""
+        )
+
+    def find_element(self, by="id", value=None):
+        return self.tab._find_element(self.object_id, by, value)
+
+    def find_elements(self, by="id", value=None):
+        return self.tab._find_elements(self.object_id, by, value)
+
+    def __repr__(self):
+        return "{0:s}({1:s})".format(self.__class__.__name__, self.object_id)
+
+
+class Tab(object):
+    """
+    a page in the browser, driven over its own (flattened) devtools session.
+    provides the commonly used part of the webdriver api.
+    """
+
+    # seconds to wait for a page to load, see set_page_load_timeout
+    page_load_timeout = 300
+
+    def __init__(self, connection, target_id, session_id, user_agent=None):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self._implicit_wait = 0
+        self.send("Page.enable")
+        if user_agent:
+            self.send("Emulation.setUserAgentOverride", {"userAgent": user_agent})
+
+    def send(self, method, params=None, timeout=None):
+        """sends a devtools command to this tab, and returns its result"""
+        return self.connection.send(method, params, self.session_id, timeout)
+
+    async def send_async(self, method, params=None, timeout=None):
+        """like send, without blocking the event loop"""
+        future = self.connection.submit(method, params, self.session_id)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                self.connection.timeout if timeout is None else timeout,
+            )
+        except asyncio.TimeoutError:
+            self.connection.forget(future)
+            raise TimeoutError("%s got no response in time" % method) from None
+
+    def execute_cdp_cmd(self, cmd, cmd_args=None):
+        return self.send(cmd, cmd_args)
+
+    def set_page_load_timeout(self, time_to_wait):
+        self.page_load_timeout = time_to_wait
+
+    def implicitly_wait(self, time_to_wait):
+        self._implicit_wait = time_to_wait
+
+    def _wait(self, future, what):
+        try:
+            return future.result(self.page_load_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutException(
+                "%s did not finish within %s seconds" % (what, self.page_load_timeout)
+            ) from None
+
+    def get(self, url):
+        loaded = self.connection.expect("Page.loadEventFired", self.session_id)
+        result = self.send("Page.navigate", {"url": url})
+        if self._navigated(url, result, loaded):
+            self._wait(loaded, "loading %s" % url)
+
+    @staticmethod
+    def _navigated(url, result, loaded):
+        """
+        checks the result of Page.navigate
+
+        :return: whether there is a page load to wait for
+        :raises WebDriverException: the navigation failed
+        """
+        if result.get("errorText") or not result.get("loaderId"):
+            # failed, or a same-document navigation which does not load anything
+            loaded.cancel()
+            if result.get("errorText"):
+                raise WebDriverException(
+                    "navigating to %s failed: %s" % (url, result["errorText"])
+                )
+            return False
+        return True
+
+    async def get_async(self, url):
+        """like get, without blocking the event loop"""
+        loaded = self.connection.expect("Page.loadEventFired", self.session_id)
+        result = await self.send_async("Page.navigate", {"url": url})
+        if not self._navigated(url, result, loaded):
+            return
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(loaded), self.page_load_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutException(
+                "loading %s did not finish within %s seconds"
+                % (url, self.page_load_timeout)
+            ) from None
+
+    async def evaluate_async(self, expression):
+        """evaluates a javascript expression, and returns its (json) value"""
+        result = await self.send_async(
+            "Runtime.evaluate", {"expression": expression, "returnByValue": True}
+        )
+        if "exceptionDetails" in result:
+            return self._unwrap(result)
+        return result["result"].get("value")
+
+    def refresh(self):
+        loaded = self.connection.expect("Page.loadEventFired", self.session_id)
+        self.send("Page.reload")
+        self._wait(loaded, "reloading")
+
+    def back(self):
+        self._history(-1)
+
+    def forward(self):
+        self._history(1)
+
+    def _history(self, delta):
+        history = self.send("Page.getNavigationHistory")
+        index = history["currentIndex"] + delta
+        if not 0 <= index < len(history["entries"]):
+            return
+        # pages restored from the back/forward cache do not fire a load event
+        navigated = self.connection.expect(
+            "Page.frameNavigated",
+            self.session_id,
+            lambda params: not params["frame"].get("parentId"),
+        )
+        self.send(
+            "Page.navigateToHistoryEntry", {"entryId": history["entries"][index]["id"]}
+        )
+        self._wait(navigated, "navigating")
+        deadline = time.monotonic() + self.page_load_timeout
+        while self._evaluate("document.readyState") != "complete":
+            if time.monotonic() > deadline:
+                raise TimeoutException("page did not finish loading")
+            time.sleep(0.05)
+
+    @property
+    def current_url(self):
+        info = self.connection.send("Target.getTargetInfo", {"targetId": self.target_id})
+        return info["targetInfo"]["url"]
+
+    @property
+    def title(self):
+        return self._evaluate("document.title")
+
+    @property
+    def page_source(self):
+        return self._evaluate("document.documentElement.outerHTML")
+
+    def execute_script(self, script, *args):
+        """
+        runs script as the body of a function, which gets args as its arguments.
+        like in selenium, CDPElements can be passed in and are returned as well.
+        """
+        function = "function() { %s\n}" % script
+        element = next((a for a in args if isinstance(a, CDPElement)), None)
+        if element is None:
+            return self._evaluate(
+                "(%s).apply(window, %s)" % (function, json.dumps(list(args)))
+            )
+        # an object is needed to call a function on, but `this` stays window
+        return self._call(
+            element.object_id,
+            "function() { return (%s).apply(window, arguments); }" % function,
+            *args
+        )
+
+    def find_element(self, by="id", value=None):
+        return self._find_element(None, by, value)
+
+    def find_elements(self, by="id", value=None):
+        return self._find_elements(None, by, value)
+
+    def _find_element(self, object_id, by, value):
+        deadline = time.monotonic() + self._implicit_wait
+        while True:
+            element = self._find(object_id, by, value, True)
+            if element is not None:
+                return element
+            if time.monotonic() >= deadline:
+                raise NoSuchElementException(
+                    "no element found using %s %r" % (by, value)
+                )
+            time.sleep(0.05)
+
+    def _find_elements(self, object_id, by, value):
+        deadline = time.monotonic() + self._implicit_wait
+        while True:
+            elements = self._find(object_id, by, value, False)
+            if elements or time.monotonic() >= deadline:
+                return elements
+            time.sleep(0.05)
+
+    def _find(self, object_id, by, value, first):
+        if object_id is None:
+            return self._evaluate(
+                "(%s).call(document, %s, %s, %s)"
+                % (_FIND, json.dumps(by), json.dumps(value), json.dumps(first))
+            )
+        return self._call(object_id, _FIND, by, value, first)
+
+    def get_cookies(self):
+        return [self._cookie(c) for c in self.send("Network.getCookies")["cookies"]]
+
+    def get_cookie(self, name):
+        for cookie in self.get_cookies():
+            if cookie["name"] == name:
+                return cookie
+
+    def add_cookie(self, cookie_dict):
+        params = {
+            "name": cookie_dict["name"],
+            "value": cookie_dict["value"],
+            "path": cookie_dict.get("path", "/"),
+        }
+        for key in ("secure", "httpOnly", "sameSite"):
+            if key in cookie_dict:
+                params[key] = cookie_dict[key]
+        if "expiry" in cookie_dict:
+            params["expires"] = cookie_dict["expiry"]
+        if cookie_dict.get("domain"):
+            params["domain"] = cookie_dict["domain"]
+        else:
+            params["url"] = self.current_url
+        if self.send("Network.setCookie", params).get("success") is False:
+            raise WebDriverException("could not set cookie %s" % cookie_dict["name"])
+
+    def delete_cookie(self, name):
+        self.send("Network.deleteCookies", {"name": name, "url": self.current_url})
+
+    def delete_all_cookies(self):
+        for cookie in self.get_cookies():
+            self.send(
+                "Network.deleteCookies",
+                {
+                    "name": cookie["name"],
+                    "domain": cookie["domain"],
+                    "path": cookie["path"],
+                },
+            )
+
+    @staticmethod
+    def _cookie(cookie):
+        """converts a devtools cookie into the webdriver format"""
+        result = {
+            "name": cookie["name"],
+            "value": cookie["value"],
+            "domain": cookie["domain"],
+            "path": cookie["path"],
+            "secure": cookie["secure"],
+            "httpOnly": cookie["httpOnly"],
+        }
+        if not cookie.get("session") and cookie.get("expires", -1) > 0:
+            result["expiry"] = int(cookie["expires"])
+        if cookie.get("sameSite"):
+            result["sameSite"] = cookie["sameSite"]
+        return result
+
+    def get_screenshot_as_base64(self):
+        return self.send("Page.captureScreenshot", {"format": "png"})["data"]
+
+    def get_screenshot_as_png(self):
+        return base64.b64decode(self.get_screenshot_as_base64())
+
+    def get_screenshot_as_file(self, filename):
+        try:
+            with open(filename, "wb") as f:
+                f.write(self.get_screenshot_as_png())
+        except OSError:
+            return False
+        return True
+
+    save_screenshot = get_screenshot_as_file
+
+    def close(self):
+        """closes this tab"""
+        self.connection.send("Target.closeTarget", {"targetId": self.target_id})
+
+    def _evaluate(self, expression):
+        return self._unwrap(
+            self.send(
+                "Runtime.evaluate", {"expression": expression, "objectGroup": "uc"}
+            )
+        )
+
+    def _call(self, object_id, function, *args):
+        arguments = [
+            {"objectId": a.object_id} if isinstance(a, CDPElement) else {"value": a}
+            for a in args
+        ]
+        try:
+            result = self.send(
+                "Runtime.callFunctionOn",
+                {
+                    "functionDeclaration": function,
+                    "objectId": object_id,
+                    "arguments": arguments,
+                    "objectGroup": "uc",
+                },
+            )
+        except CDPError as e:
+            if "object with given id" in e.message:
+                raise StaleElementReferenceException(
+                    "element is not attached to the page document"
+                ) from None
+            raise
+        return self._unwrap(result)
+
+    def _unwrap(self, result):
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise JavascriptException(
+                details.get("exception", {}).get("description") or details.get("text")
+            )
+        return self._value(result["result"])
+
+    def _value(self, remote):
+        """turns a Runtime.RemoteObject into a python value"""
+        if "value" in remote or remote.get("type") == "undefined":
+            return remote.get("value")
+        if remote.get("subtype") == "null":
+            return None
+        if remote.get("subtype") == "node":
+            return CDPElement(self, remote["objectId"])
+        if remote.get("subtype") == "array" or remote.get("className") in (
+            "NodeList",
+            "HTMLCollection",
+        ):
+            props = self.send(
+                "Runtime.getProperties",
+                {"objectId": remote["objectId"], "ownProperties": True},
+            )["result"]
+            items = [p for p in props if p["name"].isdigit() and "value" in p]
+            items.sort(key=lambda p: int(p["name"]))
+            return [self._value(p["value"]) for p in items]
+        if remote.get("type") == "object" and "objectId" in remote:
+            # a plain object: get it as json, once
+            try:
+                result = self.send(
+                    "Runtime.callFunctionOn",
+                    {
+                        "functionDeclaration": "function() { return this; }",
+                        "objectId": remote["objectId"],
+                        "returnByValue": True,
+                    },
+                )
+            except CDPError:
+                # cannot be serialized, ex: window (cyclic)
+                result = {}
+            if "value" in result.get("result", {}):
+                return result["result"]["value"]
+        # functions, symbols, and whatever cannot be serialized
+        return remote.get("description")
+
+    def __repr__(self):
+        return "{0:s}(target_id={1:s})".format(self.__class__.__name__, self.target_id)
+
+
+def open_tabs(connection, count, url=None, user_agent=None):
+    """
+    opens count new tabs in the browser at the other end of connection,
+    each attached to its own flattened session. the commands for all tabs
+    are sent at once, instead of waiting for each in turn. when url is
+    given, all tabs navigate to it at the same time.
+
+    :return: list of Tab
+    """
+    created = [
+        connection.submit("Target.createTarget", {"url": "about:blank"})
+        for _ in range(count)
+    ]
+    target_ids = [f.result(connection.timeout)["targetId"] for f in created]
+    attached = [
+        connection.submit(
+            "Target.attachToTarget", {"targetId": target_id, "flatten": True}
+        )
+        for target_id in target_ids
+    ]
+    tabs = []
+    for target_id, future in zip(target_ids, attached):
+        session_id = future.result(connection.timeout)["sessionId"]
+        tabs.append(Tab(connection, target_id, session_id, user_agent))
+    if url:
+        loads = [
+            connection.expect("Page.loadEventFired", tab.session_id) for tab in tabs
+        ]
+        navigations = [
+            connection.submit("Page.navigate", {"url": url}, tab.session_id)
+            for tab in tabs
+        ]
+        try:
+            pending = [
+                loaded
+                for loaded, future in zip(loads, navigations)
+                if Tab._navigated(url, future.result(connection.timeout), loaded)
+            ]
+            done, not_done = wait(pending, Tab.page_load_timeout)
+            if not_done:
+                raise TimeoutException(
+                    "loading %s did not finish within %s seconds"
+                    % (url, Tab.page_load_timeout)
+                )
+            for loaded in done:
+                loaded.result()
+        finally:
+            for loaded in loads:
+                loaded.cancel()
+    return tabs
+
+
+class CDPDriver(Tab):
+    """
+    a browser driven without chromedriver. the driver itself is the first tab
+    of the browser.
+    """
+
+    def __init__(
+        self,
+        options=None,
+        user_data_dir=None,
+        browser_executable_path=None,
+        port=0,
+        headless=False,
+        profile_template=None,
+        suppress_welcome=True,
+        use_subprocess=True,
+        no_sandbox=True,
+        startup_timeout=30,
+    ):
+        """
+        Parameters
+        ----------
+        the parameters are the same as uc.Chrome's, except:
+
+        startup_timeout: float, optional, default: 30
+            seconds to wait for the browser to start
+        """
+        self.startup_profile = StartupProfile()
+        self.connection = None
+        self.browser_pid = None
+        self._process = None
+        options = options or ChromeOptions()
+
+        self.launch_plan = LaunchPlan.get(
+            options.binary_location or browser_executable_path
+        )
+        if not self.launch_plan:
+            raise FileNotFoundError(
+                "could not determine the browser executable, "
+                "specify it using the browser_executable_path parameter"
+            )
+        self.startup_profile.lap("find_browser")
+
+        if options.debugger_address:
+            host, port = options.debugger_address.split(":")
+            port = int(port)
+        else:
+            host, port = "127.0.0.1", port or free_port()
+        self.debugger_address = "%s:%d" % (host, port)
+
+        arguments = list(options.arguments)
+        language = None
+        for arg in arguments:
+            m = re.match("--user-data-dir=(.*)", arg)
+            if m:
+                user_data_dir = m[1]
+            elif arg.startswith("--lang"):
+                language = arg
+        self.keep_user_data_dir = bool(user_data_dir)
+        if not user_data_dir:
+            if profile_template:
+                user_data_dir = clone_profile(profile_template)
+            else:
+                user_data_dir = os.path.normpath(tempfile.mkdtemp())
+        self.user_data_dir = user_data_dir
+        if "--user-data-dir=%s" % user_data_dir not in arguments:
+            arguments.append("--user-data-dir=%s" % user_data_dir)
+        if not language:
+            arguments.append("--lang=%s" % self.launch_plan.language)
+        self.startup_profile.lap("profile")
+
+        arguments += [
+            "--remote-debugging-host=%s" % host,
+            "--remote-debugging-port=%d" % port,
+            "--window-size=1920,1080",
+            "--start-maximized",
+        ]
+        if suppress_welcome:
+            arguments += ["--no-default-browser-check", "--no-first-run"]
+        if no_sandbox:
+            arguments += ["--no-sandbox", "--test-type"]
+        headless = headless or getattr(options, "headless", False)
+        if headless:
+            version_main = self.launch_plan.version_main
+            arguments = [a for a in arguments if "headless" not in a]
+            arguments.append(
+                "--headless=chrome"
+                if version_main and version_main < 108
+                else "--headless=new"
+            )
+
+        if hasattr(options, "handle_prefs"):
+            options.handle_prefs(user_data_dir, fix_exit_type=True)
+        else:
+            fix_exit_type(user_data_dir)
+        self.startup_profile.lap("prefs")
+
+        if not use_subprocess:
+            from .dprocess import start_detached
+
+            self.browser_pid = start_detached(self.launch_plan.browser_path, *arguments)
+        else:
+            self._process = subprocess.Popen(
+                [self.launch_plan.browser_path, *arguments],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                close_fds=IS_POSIX,
+            )
+            self.browser_pid = self._process.pid
+        self.startup_profile.lap("browser_launch")
+
+        try:
+            wait_for_browser(
+                self.debugger_address,
+                startup_timeout,
+                alive=self._process and (lambda: self._process.poll() is None),
+            )
+            self.startup_profile.lap("browser_ready")
+            version = fetch_json("http://%s/json/version" % self.debugger_address)
+            self.connection = Connection(version["webSocketDebuggerUrl"])
+            pages = [
+                t
+                for t in self.connection.send("Target.getTargets")["targetInfos"]
+                if t["type"] == "page"
+            ]
+            if pages:
+                target_id = pages[0]["targetId"]
+            else:
+                target_id = self.connection.send(
+                    "Target.createTarget", {"url": "about:blank"}
+                )["targetId"]
+            session_id = self.connection.send(
+                "Target.attachToTarget", {"targetId": target_id, "flatten": True}
+            )["sessionId"]
+        except BaseException:
+            self.quit()
+            raise
+
+        # headless announces itself in the user agent
+        self.user_agent = None
+        if headless:
+            self.user_agent = version["User-Agent"].replace("HeadlessChrome", "Chrome")
+        super().__init__(self.connection, target_id, session_id, self.user_agent)
+        self.startup_profile.lap("connect")
+        self.startup_profile.finish()
+
+    def new_tab(self, url=None):
+        """opens a new tab, see Tab"""
+        return self.open_tabs(1, url)[0]
+
+    def open_tabs(self, count, url=None):
+        """
+        opens count new tabs, which can be driven concurrently
+        (from threads, or using the *_async methods from asyncio)
+        """
+        return open_tabs(self.connection, count, url, self.user_agent)
+
+    def quit(self, wait=True):
+        """
+        closes the browser and removes the temporary profile.
+        with wait=False, the latter is left to a background thread.
+        """
+        if self.connection and not self.connection.closed:
+            try:
+                # lets the browser shut down cleanly
+                self.connection.send("Browser.close", timeout=5)
+            except Exception as e:
+                logger.debug("Browser.close: %s" % e)
+            self.connection.close()
+        pid, self.browser_pid = self.browser_pid, None
+        if pid:
+            try:
+                os.kill(pid, 15)
+            except OSError:
+                pass
+        if self._process is not None and wait:
+            try:
+                self._process.wait(10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        remove = not self.keep_user_data_dir
+        if not wait:
+            from .reaper import reaper
+
+            reaper.submit(pid, self.user_data_dir if remove else None)
+        elif remove:
+            from .reaper import remove_profile
+
+            remove_profile(self.user_data_dir)
+        # it is taken care of now
+        self.keep_user_data_dir = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.quit()
+
+    def __del__(self):
+        try:
+            self.quit()
+        except Exception:
+            pass
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# this module is part of undetected_chromedriver
+
+"""
+a persistent devtools websocket connection, which any number of threads
+can send commands over at the same time.
+
+responses are matched to their commands by id, events are routed to
+listeners. commands for a flattened target session (see Target.attachToTarget)
+carry its sessionId, so one connection to the browser serves all its tabs.
+"""
+
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import inspect
+import itertools
+import json
+import logging
+import threading
+
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
+
+
+logger = logging.getLogger(__name__)
+
+# keyword arguments only websockets >= 15 knows: never go through a proxy to
+# reach the local browser, and do not ping it (a busy browser answers late)
+_CONNECT_KW = {}
+for _name in ("proxy", "ping_interval"):
+    if _name in inspect.signature(connect).parameters:
+        _CONNECT_KW[_name] = None
+
+
+class CDPError(Exception):
+    """an error response to a devtools command"""
+
+    def __init__(self, method, error):
+        self.method = method
+        self.code = error.get("code")
+        self.message = error.get("message", "")
+        self.data = error.get("data")
+        super().__init__(
+            "%s failed: %s%s"
+            % (method, self.message, " (%s)" % self.data if self.data else "")
+        )
+
+
+class Connection(object):
+    """
+    a devtools websocket connection
+
+        conn = Connection("ws://127.0.0.1:9222/devtools/browser/...")
+        conn.send("Target.getTargets")
+        loaded = conn.expect("Page.loadEventFired", session_id)
+        conn.send("Page.navigate", {"url": url}, session_id)
+        loaded.result(timeout=10)
+    """
+
+    # seconds a command may take when no timeout is given
+    timeout = 30
+
+    def __init__(self, url, open_timeout=10):
+        self.url = url
+        self._ws = connect(
+            url,
+            open_timeout=open_timeout,
+            max_size=None,
+            compression=None,
+            **_CONNECT_KW,
+        )
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        # {id: (method, Future)}
+        self._pending = {}
+        # {method: [(callback, session_id)]}, method "*" = all events
+        self._listeners = {}
+        # [(method, session_id, predicate, Future)]
+        self._waiters = []
+        self._closed = False
+        self._reader = threading.Thread(
+            target=self._read, name="uc-cdp-connection", daemon=True
+        )
+        self._reader.start()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def submit(self, method, params=None, session_id=None):
+        """
+        sends a command without waiting for its response
+
+        :return: a Future resolving to the result of the command
+        """
+        future = Future()
+        # commands cannot be taken back once sent
+        future.set_running_or_notify_cancel()
+        message = {"id": None, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        with self._lock:
+            if self._closed:
+                raise ConnectionError("connection to %s is closed" % self.url)
+            message["id"] = cmd_id = next(self._ids)
+            self._pending[cmd_id] = (method, future)
+        try:
+            with self._send_lock:
+                self._ws.send(json.dumps(message))
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(cmd_id, None)
+            raise ConnectionError("could not send %s: %s" % (method, e)) from e
+        future.cmd_id = cmd_id
+        return future
+
+    def send(self, method, params=None, session_id=None, timeout=None):
+        """
+        sends a command and waits for its result
+
+        :raises CDPError: when the browser answers with an error
+        :raises TimeoutError: no response within timeout (None = Connection.timeout)
+        """
+        future = self.submit(method, params, session_id)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            self.forget(future)
+            raise TimeoutError(
+                "%s got no response within %s seconds" % (method, timeout)
+            ) from None
+
+    def forget(self, future):
+        """
+        stops waiting for the response to the command of given Future (as
+        returned by submit), for example after giving up on it
+        """
+        with self._lock:
+            self._pending.pop(future.cmd_id, None)
+
+    def add_listener(self, method, callback, session_id=None):
+        """
+        calls callback(message) for every event named method ("*" = all events)
+        of given session (None = any). callbacks run on the connection's reader
+        thread, so they should return quickly.
+        """
+        with self._lock:
+            self._listeners.setdefault(method, []).append((callback, session_id))
+
+    def remove_listener(self, method, callback, session_id=None):
+        with self._lock:
+            listeners = self._listeners.get(method, [])
+            try:
+                listeners.remove((callback, session_id))
+            except ValueError:
+                pass
+            if not listeners:
+                self._listeners.pop(method, None)
+
+    def expect(self, method, session_id=None, predicate=None):
+        """
+        returns a Future resolving to the next event named method of given
+        session (None = any) for which predicate(params) is true. call it before
+        sending the command triggering the event, so it cannot be missed.
+        cancel the Future if the event is not needed anymore.
+        """
+        future = Future()
+        waiter = (method, session_id, predicate, future)
+        with self._lock:
+            self._waiters.append(waiter)
+
+        def forget(_):
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+        future.add_done_callback(forget)
+        return future
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            self._ws.close()
+        except Exception as e:
+            logger.debug("closing %s: %s" % (self.url, e))
+
+    def _read(self):
+        try:
+            while True:
+                message = json.loads(self._ws.recv())
+                if "id" in message:
+                    self._resolve(message)
+                else:
+                    self._dispatch(message)
+        except ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.warning("devtools connection %s failed: %s" % (self.url, e))
+        finally:
+            with self._lock:
+                self._closed = True
+                pending, self._pending = self._pending, {}
+                waiters, self._waiters = self._waiters, []
+            error = ConnectionError("connection to %s closed" % self.url)
+            for method, future in pending.values():
+                future.set_exception(error)
+            for waiter in waiters:
+                try:
+                    waiter[3].set_exception(error)
+                except Exception:
+                    # cancelled
+                    pass
+
+    def _resolve(self, message):
+        with self._lock:
+            method, future = self._pending.pop(message["id"], (None, None))
+        if future is None:
+            # timed out already
+            return
+        if "error" in message:
+            future.set_exception(CDPError(method, message["error"]))
+        else:
+            future.set_result(message.get("result", {}))
+
+    def _dispatch(self, message):
+        method = message.get("method")
+        session_id = message.get("sessionId")
+        params = message.get("params", {})
+        with self._lock:
+            listeners = self._listeners.get(method, []) + self._listeners.get("*", [])
+            waiters = [
+                w
+                for w in self._waiters
+                if w[0] == method and (w[1] is None or w[1] == session_id)
+            ]
+        for method_, session, predicate, future in waiters:
+            try:
+                if predicate is None or predicate(params):
+                    future.set_result(message)
+            except Exception as e:
+                # cancelled in the meantime, or a failing predicate
+                logger.debug("event waiter for %s: %s" % (method_, e))
+        for callback, session in listeners:
+            if session is None or session == session_id:
+                try:
+                    callback(message)
+                except Exception as e:
+                    logger.warning("listener for %s failed: %s" % (method, e))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# this module is part of undetected_chromedriver
+
+import json
+import logging
+import os
+import threading
+
+from .patcher import Patcher
+
+
+logger = logging.getLogger(__name__)
+
+
+class LaunchPlan(object):
+    """
+    the parts of starting a browser which are the same for every uc.Chrome():
+    which browser executable to use, its version, and the default language.
+
+    the browser executable is looked up once, then memoized in process and
+    (unless persist is False) on disk, in `path`. it is looked up again only
+    when it is gone. its version comes from Patcher.detect_browser_version,
+    which caches it by the mtime, inode and size of the binary, so after the
+    first launch neither costs more than a stat() call.
+    """
+
+    persist = True
+    path = os.path.join(Patcher.data_path, "launch_plans.json")
+
+    # {key: LaunchPlan}
+    _plans = {}
+    _lock = threading.Lock()
+    _language = None
+
+    def __init__(self, browser_path):
+        self.browser_path = browser_path
+
+    @property
+    def version(self):
+        """version of the browser, None when unknown"""
+        version = Patcher.detect_browser_version(self.browser_path)
+        return str(version) if version else None
+
+    @property
+    def version_main(self):
+        """major version of the browser, 0 when unknown"""
+        version = Patcher.detect_browser_version(self.browser_path)
+        return version.release[0] if version else 0
+
+    @property
+    def language(self):
+        """
+        the default language from the locale. not persisted, since it
+        depends on the environment of the process
+        """
+        cls = self.__class__
+        if cls._language is None:
+            language = None
+            try:
+                import locale
+
+                language = locale.getdefaultlocale()[0].replace("_", "-")
+            except Exception:
+                pass
+            cls._language = language or "en-US"
+        return cls._language
+
+    @property
+    def valid(self):
+        return os.path.isfile(self.browser_path)
+
+    @classmethod
+    def get(cls, browser_executable_path=None):
+        """
+        returns the plan for given browser executable (None = look for
+        one in the usual locations), or None if there is no browser.
+        """
+        # which browser is found depends on PATH
+        key = browser_executable_path or "auto:%s" % os.environ.get("PATH", "")
+        with cls._lock:
+            plan = cls._plans.get(key)
+            if plan is None or not plan.valid:
+                plan = cls._load(key)
+                if plan is None or not plan.valid:
+                    plan = cls._resolve(browser_executable_path)
+                    if plan is None:
+                        cls._plans.pop(key, None)
+                        return None
+                    cls._store(key, plan)
+                cls._plans[key] = plan
+            return plan
+
+    @classmethod
+    def _resolve(cls, browser_executable_path):
+        from . import find_chrome_executable
+
+        path = browser_executable_path or find_chrome_executable()
+        if not path or not os.path.isfile(path):
+            return None
+        logger.debug("resolved launch plan: %s" % path)
+        return cls(path)
+
+    @classmethod
+    def _read(cls):
+        try:
+            with open(cls.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def _load(cls, key):
+        if not cls.persist:
+            return None
+        known = cls._read().get(key)
+        if not known:
+            return None
+        try:
+            return cls(known["browser_path"])
+        except (KeyError, TypeError):
+            return None
+
+    @classmethod
+    def _store(cls, key, plan):
+        if not cls.persist:
+            return
+        plans = cls._read()
+        plans[key] = {"browser_path": plan.browser_path}
+        try:
+            os.makedirs(os.path.dirname(cls.path), exist_ok=True)
+            Patcher._write_atomic(cls.path, json.dumps(plans).encode())
+        except OSError as e:
+            logger.debug("could not store launch plan: %s" % e)
+
+    def __repr__(self):
+        return "{0:s}(browser_path={1!r}, version={2!r})".format(
+            self.__class__.__name__, self.browser_path, self.version
+        )
@@ -2,11 +2,13 @@
 # this module is part of undetected_chromedriver
 
 
-import json
 import os
 
 from selenium.webdriver.chromium.options import ChromiumOptions as _ChromiumOptions
 
+from .profiles import _merge
+from .profiles import update_preferences
+
 
 class ChromeOptions(_ChromiumOptions):
     _session = None
@@ -45,36 +47,29 @@ class ChromeOptions(_ChromiumOptions):
         merges b into a
         leaf values in a are overwritten with values from b
         """
-        for key in b:
-            if key in a:
-                if isinstance(a[key], dict) and isinstance(b[key], dict):
-                    ChromeOptions._merge_nested(a[key], b[key])
-                    continue
-            a[key] = b[key]
+        _merge(a, b)
         return a
 
-    def handle_prefs(self, user_data_dir):
+    def handle_prefs(self, user_data_dir, fix_exit_type=False):
+        """
+        writes the prefs (see add_experimental_option) into the profile's
+        Preferences file, and fixes the exit_type flag when fix_exit_type
+        is set, both in a single atomic write (if anything changed at all).
+        """
         prefs = self.experimental_options.get("prefs")
-        if prefs:
-            user_data_dir = user_data_dir or self._user_data_dir
-            default_path = os.path.join(user_data_dir, "Default")
-            os.makedirs(default_path, exist_ok=True)
-
-            # undot prefs dict keys
-            undot_prefs = {}
-            for key, value in prefs.items():
-                undot_prefs = self._merge_nested(
-                    undot_prefs, self._undot_key(key, value)
-                )
+        user_data_dir = user_data_dir or self._user_data_dir
 
-            prefs_file = os.path.join(default_path, "Preferences")
-            if os.path.exists(prefs_file):
-                with open(prefs_file, encoding="latin1", mode="r") as f:
-                    undot_prefs = self._merge_nested(json.load(f), undot_prefs)
+        # undot prefs dict keys
+        undot_prefs = {}
+        for key, value in (prefs or {}).items():
+            undot_prefs = self._merge_nested(undot_prefs, self._undot_key(key, value))
 
-            with open(prefs_file, encoding="latin1", mode="w") as f:
-                json.dump(undot_prefs, f)
+        if user_data_dir:
+            update_preferences(
+                user_data_dir, undot_prefs, fix_exit_type=fix_exit_type
+            )
 
+        if prefs:
             # remove the experimental_options to avoid an error
             del self._experimental_options["prefs"]
 
@@ -1,32 +1,209 @@
 #!/usr/bin/env python3
 # this module is part of undetected_chromedriver
 
+from packaging.version import InvalidVersion
 from packaging.version import Version as LooseVersion
+import collections
+import contextlib
+import hashlib
 import io
 import json
 import logging
+import mmap
 import os
 import pathlib
 import platform
 import random
 import re
 import shutil
+import stat
 import string
 import subprocess
 import sys
+import threading
 import time
+from urllib.error import HTTPError
+from urllib.error import URLError
+from urllib.request import Request
 from urllib.request import urlopen
-from urllib.request import urlretrieve
 import zipfile
-from multiprocessing import Lock
+
+from . import IS_POSIX
+
 
 logger = logging.getLogger(__name__)
 
-IS_POSIX = sys.platform.startswith(("darwin", "cygwin", "linux", "linux2"))
+if IS_POSIX:
+    import fcntl
+else:
+    import msvcrt
+
+# bump this whenever patch_exe changes the bytes it writes, so binaries
+# patched by an older revision are not picked up from the cache anymore
+PATCH_REVISION = 1
+
+
+def _rmtree(path):
+    """
+    shutil.rmtree, which also removes read-only files (like the cached
+    driver binaries), which windows refuses to delete otherwise
+    """
+
+    def make_writable(func, p, _):
+        os.chmod(p, stat.S_IWRITE)
+        func(p)
+
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=make_writable)
+    else:
+        shutil.rmtree(path, onerror=make_writable)
+
+
+def _pid_alive(pid: int) -> bool:
+    """returns whether a process with given pid is running on this host"""
+    if IS_POSIX:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+    import ctypes
+
+    kernel32 = ctypes.windll.kernel32
+    # PROCESS_QUERY_LIMITED_INFORMATION
+    handle = kernel32.OpenProcess(0x1000, False, pid)
+    if not handle:
+        # access denied means it exists
+        return kernel32.GetLastError() == 5
+    try:
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        return code.value == 259  # STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+class FileLock(object):
+    """
+    a lock shared by all processes on this host, backed by flock() on
+    posix and msvcrt.locking() on windows.
+
+    shared=True takes a reader lock (posix only, on windows every lock is
+    exclusive), which can be held by many processes at once, but not while
+    any process holds the exclusive (writer) lock.
+
+    the kernel releases the lock when its holder dies, so on posix a lock is
+    never broken: the pid in the lock file is that of the last exclusive
+    holder, which need not be the current (shared) one. on windows, where
+    every lock is exclusive and its holder writes its pid right away, a lock
+    held by a pid which is no longer running is broken once `timeout` expires.
+    """
+
+    def __init__(self, path, shared=False, timeout=120, poll_interval=0.01):
+        self.path = path
+        self.shared = shared
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def _lock(self, fd):
+        if IS_POSIX:
+            mode = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+            fcntl.flock(fd, mode | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+    def _unlock(self, fd):
+        if IS_POSIX:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, 0)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def _break_stale(self):
+        if IS_POSIX:
+            return False
+        try:
+            with open(self.path, encoding="ascii") as f:
+                pid = int(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return False
+        if _pid_alive(pid):
+            return False
+        logger.warning("breaking stale lock %s held by pid %d" % (self.path, pid))
+        try:
+            os.unlink(self.path)
+        except OSError:
+            return False
+        return True
+
+    def acquire(self):
+        if self._fd is not None:
+            raise RuntimeError("lock %s is already acquired" % self.path)
+        deadline = time.monotonic() + self.timeout
+        interval = self.poll_interval
+        broken = False
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                self._lock(fd)
+            except OSError:
+                os.close(fd)
+                if time.monotonic() > deadline:
+                    if not broken and self._break_stale():
+                        broken = True
+                        continue
+                    raise TimeoutError(
+                        "could not acquire lock %s within %s seconds"
+                        % (self.path, self.timeout)
+                    )
+                time.sleep(interval)
+                interval = min(interval * 2, 0.25)
+                continue
+            try:
+                # a stale lock file might have been replaced in the meantime
+                if os.path.samestat(os.fstat(fd), os.stat(self.path)):
+                    break
+            except FileNotFoundError:
+                pass
+            self._unlock(fd)
+            os.close(fd)
+        if not self.shared:
+            os.lseek(fd, 0, 0)
+            os.write(fd, ("%d\n" % os.getpid()).encode().ljust(16))
+        self._fd = fd
+        return self
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            self._unlock(fd)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def __repr__(self):
+        return "{0:s}({1:s}, shared={2})".format(
+            self.__class__.__name__, self.path, self.shared
+        )
+
+
+# a patched driver binary in Patcher.cache_path
+CacheEntry = collections.namedtuple(
+    "CacheEntry", ["version", "platform_name", "revision", "path", "exe_path"]
+)
 
 
 class Patcher(object):
-    lock = Lock()
     exe_name = "chromedriver%s"
 
     platform = sys.platform
@@ -41,6 +218,32 @@ class Patcher(object):
     else:
         d = "~/.undetected_chromedriver"
     data_path = os.path.abspath(os.path.expanduser(d))
+    cache_path = os.path.join(data_path, "cache")
+    manifest_path = os.path.join(data_path, "manifests")
+    browser_versions_path = os.path.join(data_path, "browser_versions.json")
+
+    # detected browser versions in this process: {realpath: (stat key, version)}
+    _browser_versions = {}
+
+    # seconds a downloaded release manifest is used without revalidation
+    manifest_ttl = 3600
+    # never go online for release manifests, only use the ones on disk
+    offline = False
+    # seconds to wait for other processes fetching or patching the same driver
+    lock_timeout = 300
+    # total size in bytes of cached drivers the janitor keeps. None = unlimited
+    cache_max_size = 1 << 30
+    # seconds between janitor runs (by any process). None = never run automatically
+    janitor_interval = 3600
+    # base url (http(s):// or file://) of a mirror to use instead of the
+    # official repositories. it must have the same layout, ie:
+    #   <mirror_url>/last-known-good-versions-with-downloads.json
+    #   <mirror_url>/latest-versions-per-milestone-with-downloads.json
+    #   <mirror_url>/<version>/<platform>/chromedriver-<platform>.zip
+    # or, for drivers 114 and below:
+    #   <mirror_url>/LATEST_RELEASE_<major>
+    #   <mirror_url>/<version>/chromedriver_<platform>.zip
+    mirror_url = None
 
     def __init__(
         self,
@@ -48,6 +251,11 @@ class Patcher(object):
         force=False,
         version_main: int = 0,
         user_multi_procs=False,
+        manifest_ttl: int = None,
+        offline: bool = None,
+        browser_executable_path=None,
+        mirror_url: str = None,
+        platform_name: str = None,
     ):
         """
         Args:
@@ -57,22 +265,56 @@ class Patcher(object):
                     terminate processes which are holding lock
             version_main: 0 = auto
                 specify main chrome version (rounded, ex: 82)
+                when 0 and browser_executable_path is given, the version
+                of that browser is used
+            manifest_ttl: None = Patcher.manifest_ttl
+                seconds a cached release manifest is trusted without revalidation
+            offline: None = Patcher.offline
+                when True, release manifests are only read from the on-disk cache
+            browser_executable_path: None
+                path to the browser the driver will be used with
+            mirror_url: None = Patcher.mirror_url
+                base url of a mirror to fetch manifests and drivers from
+            platform_name: None = automatic
+                driver platform to fetch instead of the one of this host,
+                ex: linux64, mac-x64, mac-arm64, win32, win64
         """
+        if mirror_url is not None:
+            self.mirror_url = mirror_url
+        if manifest_ttl is not None:
+            self.manifest_ttl = manifest_ttl
+        if offline is not None:
+            self.offline = offline
         self.force = force
         self._custom_exe_path = False
         prefix = "undetected"
         self.user_multi_procs = user_multi_procs
 
+        if not version_main and browser_executable_path:
+            browser_version = self.detect_browser_version(browser_executable_path)
+            if browser_version:
+                logger.debug(
+                    "detected browser version %s of %s"
+                    % (browser_version, browser_executable_path)
+                )
+                version_main = browser_version.release[0]
+
         self.is_old_chromedriver = version_main and version_main <= 114
         # Needs to be called before self.exe_name is accessed
         self._set_platform_name()
+        if platform_name:
+            self.platform_name = platform_name
+            self.exe_name = self._exe_name_for(platform_name)
 
         if not os.path.exists(self.data_path):
             os.makedirs(self.data_path, exist_ok=True)
 
         if not executable_path:
+            # every instance gets its own link to the cached master binary,
+            # so concurrent drivers never unlink or replace each others file
             self.executable_path = os.path.join(
-                self.data_path, "_".join([prefix, self.exe_name])
+                self.data_path,
+                "_".join([prefix, str(os.getpid()), self._random_token(), self.exe_name]),
             )
 
         if not IS_POSIX:
@@ -80,23 +322,19 @@ class Patcher(object):
                 if not executable_path[-4:] == ".exe":
                     executable_path += ".exe"
 
-        self.zip_path = os.path.join(self.data_path, prefix)
-
-        if not executable_path:
-            if not self.user_multi_procs:
-                self.executable_path = os.path.abspath(
-                    os.path.join(".", self.executable_path)
-                )
-
         if executable_path:
             self._custom_exe_path = True
             self.executable_path = executable_path
 
         # Set the correct repository to download the Chromedriver from
-        if self.is_old_chromedriver:
+        if self.mirror_url:
+            self.url_repo = self.download_repo = self.mirror_url.rstrip("/")
+        elif self.is_old_chromedriver:
             self.url_repo = "https://chromedriver.storage.googleapis.com"
+            self.download_repo = self.url_repo
         else:
             self.url_repo = "https://googlechromelabs.github.io/chrome-for-testing"
+            self.download_repo = "https://storage.googleapis.com/chrome-for-testing-public"
 
         self.version_main = version_main
         self.version_full = None
@@ -119,8 +357,17 @@ class Patcher(object):
                 self.platform_name = "mac-x64"
             self.exe_name %= ""
 
+    @staticmethod
+    def _exe_name_for(platform_name):
+        return "chromedriver.exe" if platform_name.startswith("win") else "chromedriver"
+
     def auto(self, executable_path=None, force=False, version_main=None, _=None):
         """
+        makes sure self.executable_path points to a patched driver binary.
+
+        unless a custom executable_path is used, the patched binary is taken
+        from the cache in `cache_path` (downloading and patching it only once
+        per driver version) and linked to this instance's executable_path.
 
         Args:
             executable_path:
@@ -130,17 +377,6 @@ class Patcher(object):
         Returns:
 
         """
-        p = pathlib.Path(self.data_path)
-        if self.user_multi_procs:
-            with Lock():
-                files = list(p.rglob("*chromedriver*"))
-                most_recent = max(files, key=lambda f: f.stat().st_mtime)
-                files.remove(most_recent)
-                list(map(lambda f: f.unlink(), files))
-                if self.is_binary_patched(most_recent):
-                    self.executable_path = str(most_recent)
-                    return True
-
         if executable_path:
             self.executable_path = executable_path
             self._custom_exe_path = True
@@ -157,27 +393,395 @@ class Patcher(object):
         if force is True:
             self.force = force
 
+        master = self.ensure_cached()
+
+        # any number of processes may link the master at once, as long
+        # as nobody holds the writer lock to replace or remove it
+        while True:
+            with self.cache_lock(self.version_full, shared=True):
+                # the janitor (or remove_cached) may have evicted the entry
+                # between ensure_cached() and taking the lock
+                if not os.path.isfile(master):
+                    logger.debug("%s was evicted, reinstalling" % master)
+                    master = None
+                else:
+                    try:
+                        self.link_from_cache(master)
+                    except PermissionError:
+                        if self.force:
+                            self.force_kill_instances(self.executable_path)
+                            self.link_from_cache(master)
+                        elif not self.is_binary_patched():
+                            raise
+                        # else: assumes already running AND patched
+            if master:
+                break
+            master = self.ensure_cached(self.version_full)
         try:
-            os.unlink(self.executable_path)
-        except PermissionError:
-            if self.force:
-                self.force_kill_instances(self.executable_path)
-                return self.auto(force=not self.force)
+            # the entry folder's mtime is its last use, for the janitor
+            os.utime(os.path.dirname(master))
+        except OSError:
+            pass
+        self.start_janitor()
+        return True
+
+    def ensure_cached(self, release=None) -> str:
+        """
+        makes sure the patched driver for given version is in the cache,
+        downloading and patching it when needed.
+
+        Args:
+            release: the driver version. None = use resolve_release()
+
+        :return: path to the cached master binary
+        """
+        if release is None:
+            release = self.resolve_release()
+        self.version_main = release.release[0]
+        self.version_full = release
+
+        master = self.cached_binary_path(release)
+        if not os.path.isfile(master):
+            # only one process downloads and patches, the others wait for it
+            with self.cache_lock(release):
+                if not os.path.isfile(master):
+                    self.install_cached(release)
+        else:
+            logger.debug("using cached driver binary %s" % master)
+        return master
+
+    def cache_lock(self, release, shared=False) -> FileLock:
+        """
+        returns the cross process lock of the cache entry for given version.
+        writers (installing or removing the cached binary) take it exclusively,
+        readers (linking the cached binary) take it shared.
+        """
+        entry = os.path.dirname(self.cached_binary_path(release))
+        return self.entry_lock(entry, shared=shared, timeout=self.lock_timeout)
+
+    @classmethod
+    def entry_lock(cls, path, shared=False, timeout=None) -> FileLock:
+        """returns the cross process lock of the cache entry folder at path"""
+        os.makedirs(cls.cache_path, exist_ok=True)
+        if timeout is None:
+            timeout = cls.lock_timeout
+        return FileLock(path + ".lock", shared=shared, timeout=timeout)
+
+    def resolve_release(self):
+        """
+        returns the driver version to use.
+
+        when a major version is requested (or in multi process mode, where
+        any previously patched binary will do) the cache is consulted first,
+        so a cache hit does not need network access.
+
+        :return: version
+        :rtype: LooseVersion
+        """
+        if self.version_main or self.user_multi_procs:
+            release = self.find_cached_release(self.version_main)
+            if release:
+                return release
+        return self.fetch_release_number()
+
+    @classmethod
+    def detect_browser_version(cls, browser_executable_path):
+        """
+        returns the version of the browser at given path, without going online.
+
+        results are cached, in process and in `browser_versions_path`, by the
+        path, mtime, inode and size of the browser binary, so the (relatively
+        expensive) detection only runs again after the browser got updated.
+
+        :return: version or None when it could not be determined
+        :rtype: LooseVersion
+        """
+        path = os.path.realpath(browser_executable_path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        key = [st.st_mtime_ns, st.st_ino, st.st_size]
+
+        known = cls._browser_versions.get(path)
+        if known and known[0] == key:
+            return LooseVersion(known[1])
+
+        try:
+            with open(cls.browser_versions_path, encoding="utf-8") as f:
+                versions = json.load(f)
+        except (OSError, ValueError):
+            versions = {}
+        known = versions.get(path)
+        if known and known.get("stat") == key:
+            version = known["version"]
+        else:
+            version = cls._read_browser_version(path)
+            if not version:
+                return
+            versions[path] = {"stat": key, "version": version}
             try:
-                if self.is_binary_patched():
-                    # assumes already running AND patched
-                    return True
-            except PermissionError:
-                pass
-            # return False
+                os.makedirs(cls.data_path, exist_ok=True)
+                cls._write_atomic(
+                    cls.browser_versions_path, json.dumps(versions).encode()
+                )
+            except OSError as e:
+                logger.debug("could not store browser version: %s" % e)
+        cls._browser_versions[path] = (key, version)
+        return LooseVersion(version)
+
+    @staticmethod
+    def _read_browser_version(path):
+        """
+        reads the version of the browser at path from its install metadata,
+        or, when there is none, from the output of `<browser> --version`
+        """
+        version_re = r"\d+\.\d+\.\d+\.\d+"
+        dirname = os.path.dirname(path)
+        if not IS_POSIX:
+            # windows installs keep their resources in a folder named after the
+            # version. note: chrome.exe --version would launch the browser
+            try:
+                found = [e for e in os.listdir(dirname) if re.fullmatch(version_re, e)]
+            except OSError:
+                return
+            return str(max(map(LooseVersion, found))) if found else None
+
+        # macos app bundle: Contents/MacOS/<binary> => Contents/Info.plist
+        plist_file = os.path.join(os.path.dirname(dirname), "Info.plist")
+        if os.path.isfile(plist_file):
+            import plistlib
+
+            try:
+                with open(plist_file, mode="rb") as f:
+                    version = plistlib.load(f).get("CFBundleShortVersionString")
+                if version and re.fullmatch(version_re, version):
+                    return version
+            except Exception as e:
+                logger.debug("could not read %s: %s" % (plist_file, e))
+
+        try:
+            output = subprocess.run(
+                [path, "--version"], capture_output=True, text=True, timeout=15
+            ).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.debug("could not determine version of %s: %s" % (path, e))
+            return
+        match = re.search(version_re, output)
+        return match[0] if match else None
+
+    def cached_binary_path(self, release) -> str:
+        """
+        returns the path of the patched master binary for given version.
+        the binary is keyed by (driver version, platform, patch revision)
+        """
+        entry = "%s_%s_r%d" % (release, self.platform_name, PATCH_REVISION)
+        return os.path.join(self.cache_path, entry, self.exe_name)
+
+    def find_cached_release(self, version_main=None):
+        """
+        finds the highest cached driver version for this platform and patch revision
+
+        Args:
+            version_main: if given, only consider versions of this major version
+
+        :return: version or None
+        :rtype: LooseVersion
+        """
+        found = None
+        for entry in self.iter_cache():
+            if entry.platform_name != self.platform_name:
+                continue
+            if entry.revision != PATCH_REVISION:
+                continue
+            if version_main and entry.version.release[0] != int(version_main):
+                continue
+            if not os.path.isfile(entry.exe_path):
+                continue
+            if not found or entry.version > found:
+                found = entry.version
+        return found
+
+    @classmethod
+    def iter_cache(cls):
+        """
+        yields a CacheEntry for every driver in the cache, of any platform
+        and patch revision
+        """
+        try:
+            names = os.listdir(cls.cache_path)
+        except FileNotFoundError:
+            return
+        for name in names:
+            match = re.fullmatch(r"([^_]+)_([^_]+)_r(\d+)", name)
+            if not match:
+                continue
+            try:
+                version = LooseVersion(match[1])
+            except InvalidVersion:
+                continue
+            path = os.path.join(cls.cache_path, name)
+            if not os.path.isdir(path):
+                continue
+            exe_path = os.path.join(path, cls._exe_name_for(match[2]))
+            yield CacheEntry(version, match[2], int(match[3]), path, exe_path)
+
+    @classmethod
+    def remove_cached(cls, entry, timeout=0) -> bool:
+        """
+        removes given CacheEntry, unless some process is linking it right now.
+        processes which already use a link or copy of it are not affected.
+
+        :return: True when removed
+        """
+        try:
+            with cls.entry_lock(entry.path, timeout=timeout):
+                _rmtree(entry.path)
+        except (TimeoutError, PermissionError):
+            # on windows, a binary which is being executed cannot be removed
+            logger.debug("not removing %s, it is in use" % entry.path)
+            return False
         except FileNotFoundError:
             pass
+        logger.debug("removed %s from cache" % entry.path)
+        return True
 
-        release = self.fetch_release_number()
-        self.version_main = release.version[0]
-        self.version_full = release
-        self.unzip_package(self.fetch_package())
-        return self.patch()
+    @classmethod
+    def collect_garbage(cls, keep: int = None) -> list:
+        """
+        removes what is not needed anymore from the data folder:
+        - drivers patched by another patch revision, or without a binary
+        - the oldest drivers of each platform, keeping the `keep` newest ones
+        - per instance driver links of processes which are no longer running
+        - leftovers of interrupted downloads and installs
+
+        :return: list of removed paths
+        """
+        removed = []
+        per_platform = collections.defaultdict(list)
+        for entry in cls.iter_cache():
+            if entry.revision != PATCH_REVISION or not os.path.isfile(entry.exe_path):
+                if cls.remove_cached(entry):
+                    removed.append(entry.path)
+            else:
+                per_platform[entry.platform_name].append(entry)
+        if keep is not None:
+            for entries in per_platform.values():
+                entries.sort(key=lambda e: e.version, reverse=True)
+                for entry in entries[keep:]:
+                    if cls.remove_cached(entry):
+                        removed.append(entry.path)
+
+        stale = [name for name, pid in cls._instance_links() if not _pid_alive(pid)]
+        # left by versions before the cache
+        stale += ["undetected_chromedriver", "undetected_chromedriver.exe"]
+        for name in stale:
+            try:
+                os.unlink(os.path.join(cls.data_path, name))
+            except OSError:
+                continue
+            removed.append(os.path.join(cls.data_path, name))
+
+        folders = [cls.data_path, cls.cache_path]
+        folders += [entry.path for entry in cls.iter_cache()]
+        for folder in folders:
+            try:
+                names = os.listdir(folder)
+            except FileNotFoundError:
+                continue
+            for name in names:
+                if not name.endswith((".part", ".tmp", ".tmp.patched")):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    # a running download or install keeps touching it
+                    if time.time() - os.path.getmtime(path) < cls.lock_timeout:
+                        continue
+                    os.unlink(path)
+                except OSError:
+                    continue
+                removed.append(path)
+        return removed
+
+    def install_cached(self, release) -> str:
+        """
+        downloads, unpacks and patches the driver for given version, and
+        atomically moves it into the cache. the cached master binary is made
+        read-only and never modified afterwards.
+
+        :return: path to the cached master binary
+        """
+        master = self.cached_binary_path(release)
+        # the entry folder is only created once there is a binary to put in
+        temp_path = "%s.%s.tmp" % (os.path.dirname(master), self._random_token())
+        try:
+            self.unzip_package(self.fetch_package(), temp_path)
+            if not self.patch_exe(temp_path):
+                raise RuntimeError("could not patch driver %s" % release)
+            os.chmod(temp_path, 0o555)
+            os.makedirs(os.path.dirname(master), exist_ok=True)
+            # concurrent installers of the same version produce identical
+            # binaries, so whoever comes last simply replaces the file
+            os.replace(temp_path, master)
+            # renaming keeps size and mtime, so the sidecar stays valid
+            os.replace(
+                self._patch_info_path(temp_path), self._patch_info_path(master)
+            )
+        except PermissionError:
+            # windows refuses to replace a master which is being executed
+            if not os.path.isfile(master):
+                raise
+        finally:
+            for path in (temp_path, self._patch_info_path(temp_path)):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        logger.debug("cached patched driver binary %s" % master)
+        return master
+
+    def link_from_cache(self, master):
+        """
+        makes self.executable_path a hardlink (or copy, when linking
+        is not possible) of given cached master binary.
+        """
+        try:
+            if os.path.samefile(master, self.executable_path):
+                return
+        except OSError:
+            pass
+        temp_path = "%s.%s.tmp" % (self.executable_path, self._random_token())
+        try:
+            if not IS_POSIX:
+                # windows cannot delete a hardlink to a read-only file
+                raise OSError("hardlinks not used on this platform")
+            os.link(master, temp_path)
+        except OSError:
+            shutil.copyfile(master, temp_path)
+            os.chmod(temp_path, 0o755)
+        try:
+            os.replace(temp_path, self.executable_path)
+        except OSError:
+            os.unlink(temp_path)
+            raise
+
+    @classmethod
+    def _write_atomic(cls, path, data: bytes):
+        temp_path = "%s.%s.tmp" % (path, cls._random_token())
+        try:
+            with open(temp_path, mode="wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    @staticmethod
+    def _random_token():
+        return "".join(random.choices(string.ascii_lowercase + string.digits, k=8))
 
     def driver_binary_in_use(self, path: str = None) -> bool:
         """
@@ -218,13 +822,99 @@ class Patcher(object):
             pass
 
     def cleanup_unused_files(self):
-        p = pathlib.Path(self.data_path)
-        items = list(p.glob("*undetected*"))
-        for item in items:
-            try:
-                item.unlink()
-            except:
+        """removes unused files from the data folder, see janitor()"""
+        return self.janitor()
+
+    @classmethod
+    def start_janitor(cls):
+        """
+        runs janitor() in a background thread, when no process did so
+        in the last `janitor_interval` seconds
+        """
+        if cls.janitor_interval is None:
+            return
+        marker = os.path.join(cls.data_path, "janitor.last")
+        try:
+            if time.time() - os.path.getmtime(marker) < cls.janitor_interval:
+                return
+        except OSError:
+            pass
+        try:
+            # claim this run, so concurrent launches do not start one as well
+            with open(marker, mode="a"):
                 pass
+            os.utime(marker)
+        except OSError:
+            return
+        thread = threading.Thread(target=cls._run_janitor, name="uc-janitor", daemon=True)
+        thread.start()
+        return thread
+
+    @classmethod
+    def _run_janitor(cls):
+        try:
+            cls.janitor()
+        except Exception as e:
+            logger.debug("janitor failed: %s" % e)
+
+    @classmethod
+    def janitor(cls, max_size: int = None, keep: int = None) -> list:
+        """
+        collect_garbage(), after which the least recently used drivers are
+        removed from the cache until it fits in `max_size` bytes (default:
+        Patcher.cache_max_size).
+
+        drivers which are linked by running processes are pinned, as their
+        space could not be freed anyway.
+
+        :return: list of removed paths
+        """
+        if max_size is None:
+            max_size = cls.cache_max_size
+        removed = cls.collect_garbage(keep=keep)
+        if max_size is None:
+            return removed
+
+        pinned = set()
+        for name, pid in cls._instance_links():
+            if _pid_alive(pid):
+                try:
+                    st = os.stat(os.path.join(cls.data_path, name))
+                except OSError:
+                    continue
+                pinned.add((st.st_dev, st.st_ino))
+
+        total, candidates = 0, []
+        for entry in cls.iter_cache():
+            try:
+                st = os.stat(entry.exe_path)
+                last_use = os.path.getmtime(entry.path)
+            except OSError:
+                continue
+            total += st.st_size
+            if (st.st_dev, st.st_ino) not in pinned:
+                candidates.append((last_use, st.st_size, entry))
+
+        candidates.sort(key=lambda c: c[0])
+        for last_use, size, entry in candidates:
+            if total <= max_size:
+                break
+            if cls.remove_cached(entry):
+                total -= size
+                removed.append(entry.path)
+        return removed
+
+    @classmethod
+    def _instance_links(cls):
+        """yields (name, pid) of every per instance driver link in the data folder"""
+        try:
+            names = os.listdir(cls.data_path)
+        except FileNotFoundError:
+            return
+        for name in names:
+            match = re.fullmatch(r"undetected_(\d+)_\w+_chromedriver(\.exe)?", name)
+            if match:
+                yield name, int(match[1])
 
     def patch(self):
         self.patch_exe()
@@ -241,78 +931,206 @@ class Patcher(object):
             path = f"/latest_release_{self.version_main}"
             path = path.upper()
             logger.debug("getting release number from %s" % path)
-            return LooseVersion(urlopen(self.url_repo + path).read().decode())
+            return LooseVersion(self.fetch_manifest(path).decode().strip())
 
         # Endpoint for new versions of Chromedriver (115+)
         if not self.version_main:
             # Fetch the latest version
             path = "/last-known-good-versions-with-downloads.json"
             logger.debug("getting release number from %s" % path)
-            with urlopen(self.url_repo + path) as conn:
-                response = conn.read().decode()
-
-            last_versions = json.loads(response)
+            last_versions = json.loads(self.fetch_manifest(path))
             return LooseVersion(last_versions["channels"]["Stable"]["version"])
 
         # Fetch the latest minor version of the major version provided
         path = "/latest-versions-per-milestone-with-downloads.json"
         logger.debug("getting release number from %s" % path)
-        with urlopen(self.url_repo + path) as conn:
-            response = conn.read().decode()
-
-        major_versions = json.loads(response)
+        major_versions = json.loads(self.fetch_manifest(path))
         return LooseVersion(major_versions["milestones"][str(self.version_main)]["version"])
 
+    def fetch_manifest(self, path) -> bytes:
+        """
+        returns the contents of the release manifest at self.url_repo + path.
+
+        manifests are cached in `manifest_path`. a cached copy younger than
+        `manifest_ttl` seconds is returned as is, an older one is revalidated
+        using ETag / Last-Modified. when offline, or when the server cannot be
+        reached, the cached copy is used regardless of its age.
+
+        :return: manifest contents
+        """
+        url = self.url_repo + path
+        body_file = os.path.join(self.manifest_path, re.sub(r"[^\w.-]", "_", url))
+        meta_file = body_file + ".meta"
+
+        meta, body = self._read_manifest(body_file)
+        if self._manifest_usable(url, meta, body):
+            return body
+
+        os.makedirs(self.manifest_path, exist_ok=True)
+        with FileLock(body_file + ".lock", timeout=self.lock_timeout):
+            # another process might have refreshed it while we were waiting
+            meta, body = self._read_manifest(body_file)
+            if self._manifest_usable(url, meta, body):
+                return body
+
+            headers = {}
+            if body is not None:
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+            try:
+                with urlopen(Request(url, headers=headers)) as conn:
+                    new_body = conn.read()
+                    meta = {
+                        "etag": conn.headers.get("ETag"),
+                        "last_modified": conn.headers.get("Last-Modified"),
+                    }
+            except HTTPError as e:
+                if body is None:
+                    raise
+                if e.code != 304:
+                    logger.warning("could not revalidate %s (%s), using cached copy" % (url, e))
+                    return body
+                logger.debug("cached manifest %s is still valid" % url)
+                new_body = body
+            except (URLError, OSError) as e:
+                if body is None:
+                    raise
+                logger.warning("could not revalidate %s (%s), using cached copy" % (url, e))
+                return body
+
+            meta["fetched"] = time.time()
+            if new_body is not body:
+                self._write_atomic(body_file, new_body)
+            self._write_atomic(meta_file, json.dumps(meta).encode())
+            return new_body
+
+    @staticmethod
+    def _read_manifest(body_file):
+        try:
+            with open(body_file + ".meta", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_file, mode="rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return {}, None
+
+    def _manifest_usable(self, url, meta, body) -> bool:
+        """whether the cached manifest can be used without going online"""
+        if body is None:
+            if self.offline:
+                raise FileNotFoundError(
+                    "offline mode, but no cached manifest available for %s" % url
+                )
+            return False
+        age = time.time() - meta.get("fetched", 0)
+        if self.offline or 0 <= age < self.manifest_ttl:
+            logger.debug("using cached manifest %s (age %ds)" % (url, age))
+            return True
+        return False
+
     def parse_exe_version(self):
-        with io.open(self.executable_path, "rb") as f:
-            for line in iter(lambda: f.readline(), b""):
-                match = re.search(rb"platform_handle\x00content\x00([0-9.]*)", line)
-                if match:
-                    return LooseVersion(match[1].decode())
+        with self._mapped(self.executable_path) as mm:
+            match = re.search(rb"platform_handle\x00content\x00([0-9.]*)", mm)
+            if match:
+                return LooseVersion(match[1].decode())
 
     def fetch_package(self):
         """
         Downloads ChromeDriver from source
 
+        the download is streamed into a partial file in the cache folder.
+        when a previous download of the same version was interrupted, it is
+        resumed (if the server supports range requests).
+
         :return: path to downloaded file
         """
         zip_name = f"chromedriver_{self.platform_name}.zip"
         if self.is_old_chromedriver:
-            download_url = "%s/%s/%s" % (self.url_repo, self.version_full.vstring, zip_name)
+            download_url = "%s/%s/%s" % (self.download_repo, self.version_full, zip_name)
         else:
             zip_name = zip_name.replace("_", "-", 1)
-            download_url = "https://storage.googleapis.com/chrome-for-testing-public/%s/%s/%s"
-            download_url %= (self.version_full.vstring, self.platform_name, zip_name)
+            download_url = "%s/%s/%s/%s"
+            download_url %= (self.download_repo, self.version_full, self.platform_name, zip_name)
 
         logger.debug("downloading from %s" % download_url)
-        return urlretrieve(download_url)[0]
+        os.makedirs(self.cache_path, exist_ok=True)
+        fp = os.path.join(self.cache_path, "%s_%s.part" % (self.version_full, zip_name))
+        return self._download(download_url, fp)
+
+    @staticmethod
+    def _download(url, fp):
+        """
+        streams url to fp, resuming when fp already holds the first part
 
-    def unzip_package(self, fp):
+        :return: fp
         """
-        Does what it says
+        try:
+            offset = os.path.getsize(fp)
+        except OSError:
+            offset = 0
+        headers = {"Range": "bytes=%d-" % offset} if offset else {}
+        try:
+            conn = urlopen(Request(url, headers=headers))
+        except HTTPError as e:
+            if e.code != 416:
+                raise
+            # range not satisfiable: the partial file is complete already.
+            # if not, the zip check in unzip_package will tell
+            return fp
+        with conn:
+            if offset and getattr(conn, "status", None) != 206:
+                logger.debug("server does not support resuming, restarting download")
+                offset = 0
+            elif offset:
+                logger.debug("resuming download at %d bytes" % offset)
+            length = conn.headers.get("Content-Length")
+            with open(fp, mode="ab" if offset else "wb") as f:
+                shutil.copyfileobj(conn, f, 1 << 16)
+                size = f.tell()
+        if length is not None and size != offset + int(length):
+            # keep the partial file, so a next attempt can resume
+            raise IOError(
+                "incomplete download of %s (%d of %d bytes)"
+                % (url, size, offset + int(length))
+            )
+        return fp
+
+    def unzip_package(self, fp, executable_path=None):
+        """
+        Does what it says. only the driver executable is extracted,
+        straight to its destination. its CRC-32 is verified while extracting.
+
+        Args:
+            fp: path to the downloaded zip file
+            executable_path: where to put the unpacked executable,
+                             defaults to self.executable_path
 
         :return: path to unpacked executable
         """
-        exe_path = self.exe_name
+        executable_path = executable_path or self.executable_path
+        member = self.exe_name
         if not self.is_old_chromedriver:
             # The new chromedriver unzips into its own folder
-            zip_name = f"chromedriver-{self.platform_name}"
-            exe_path = os.path.join(zip_name, self.exe_name)
+            member = "chromedriver-%s/%s" % (self.platform_name, self.exe_name)
 
-        logger.debug("unzipping %s" % fp)
+        logger.debug("unzipping %s from %s" % (member, fp))
         try:
-            os.unlink(self.zip_path)
-        except (FileNotFoundError, OSError):
-            pass
-
-        os.makedirs(self.zip_path, mode=0o755, exist_ok=True)
-        with zipfile.ZipFile(fp, mode="r") as zf:
-            zf.extractall(self.zip_path)
-        os.rename(os.path.join(self.zip_path, exe_path), self.executable_path)
-        os.remove(fp)
-        shutil.rmtree(self.zip_path)
-        os.chmod(self.executable_path, 0o755)
-        return self.executable_path
+            with zipfile.ZipFile(fp, mode="r") as zf:
+                with zf.open(member) as src, open(executable_path, mode="wb") as dst:
+                    # raises zipfile.BadZipFile when the checksum does not match
+                    shutil.copyfileobj(src, dst, 1 << 20)
+        except Exception:
+            try:
+                os.unlink(executable_path)
+            except OSError:
+                pass
+            raise
+        finally:
+            os.remove(fp)
+        os.chmod(executable_path, 0o755)
+        return executable_path
 
     @staticmethod
     def force_kill_instances(exe_name):
@@ -355,43 +1173,144 @@ class Patcher(object):
         cdc = random.choices(string.ascii_letters, k=27)
         return "".join(cdc).encode()
 
-    def is_binary_patched(self, executable_path=None):
+    @staticmethod
+    @contextlib.contextmanager
+    def _mapped(path, write=False):
+        """
+        memory maps the file at given path, so it can be searched (and patched)
+        in place, without reading the whole binary into memory.
+        yields an empty bytes object for empty files, which cannot be mapped.
+        """
+        access = mmap.ACCESS_WRITE if write else mmap.ACCESS_READ
+        with io.open(path, "r+b" if write else "rb") as fh:
+            try:
+                mm = mmap.mmap(fh.fileno(), 0, access=access)
+            except ValueError:
+                yield b""
+                return
+            try:
+                yield mm
+            finally:
+                mm.close()
+
+    def is_binary_patched(self, executable_path=None, thorough=False):
+        """
+        checks whether the binary is patched.
+
+        when the sidecar written by patch_exe still matches the size and mtime
+        of the binary, this takes a single stat(). when the sidecar is stale,
+        only the patched region it points to is checked. the whole binary is
+        only scanned when there is no (usable) sidecar.
+
+        thorough=True never trusts size and mtime alone, but always reads the
+        bytes: the recorded region, or else the whole binary.
+        """
         executable_path = executable_path or self.executable_path
         try:
-            with io.open(executable_path, "rb") as fh:
-                return fh.read().find(b"undetected chromedriver") != -1
+            st = os.stat(executable_path)
+        except FileNotFoundError:
+            return False
+        info = self._read_patch_info(executable_path)
+        if info:
+            current = info["stat"] == [st.st_size, st.st_mtime_ns]
+            if current and not thorough:
+                return True
+            try:
+                with io.open(executable_path, "rb") as fh:
+                    fh.seek(info["offset"])
+                    region = fh.read(info["length"])
+            except (OSError, ValueError):
+                region = b""
+            if hashlib.sha256(region).hexdigest() == info["sha256"]:
+                if not current:
+                    self._write_patch_info(executable_path, info)
+                return True
+        try:
+            with self._mapped(executable_path) as mm:
+                return mm.find(b"undetected chromedriver") != -1
         except FileNotFoundError:
             return False
 
-    def patch_exe(self):
+    @staticmethod
+    def _patch_info_path(executable_path):
+        return executable_path + ".patched"
+
+    @classmethod
+    def _read_patch_info(cls, executable_path):
+        """returns the sidecar of a binary patched by this patch revision, or None"""
+        try:
+            with open(cls._patch_info_path(executable_path), encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(info, dict) or info.get("revision") != PATCH_REVISION:
+            return
+        if not {"stat", "offset", "length", "sha256"} <= info.keys():
+            return
+        return info
+
+    @classmethod
+    def _write_patch_info(cls, executable_path, info):
+        """(re)writes the sidecar of a patched binary, with its current size and mtime"""
+        st = os.stat(executable_path)
+        info = dict(info, stat=[st.st_size, st.st_mtime_ns], revision=PATCH_REVISION)
+        try:
+            cls._write_atomic(
+                cls._patch_info_path(executable_path), json.dumps(info).encode()
+            )
+        except OSError as e:
+            logger.debug("could not write patch info for %s: %s" % (executable_path, e))
+
+    def patch_exe(self, executable_path=None):
+        """
+        patches the binary in place, and records a sidecar next to it
+        for fast is_binary_patched() checks.
+
+        :return: the patch info, or None when the binary could not be patched
+        """
+        executable_path = executable_path or self.executable_path
         start = time.perf_counter()
-        logger.info("patching driver executable %s" % self.executable_path)
-        with io.open(self.executable_path, "r+b") as fh:
-            content = fh.read()
+        logger.info("patching driver executable %s" % executable_path)
+        with self._mapped(executable_path, write=True) as mm:
             # match_injected_codeblock = re.search(rb"{window.*;}", content)
-            match_injected_codeblock = re.search(rb"\{window\.cdc.*?;\}", content)
-            if match_injected_codeblock:
-                target_bytes = match_injected_codeblock[0]
-                new_target_bytes = (
-                    b'{console.log("undetected chromedriver 1337!")}'.ljust(
-                        len(target_bytes), b" "
-                    )
+            match_injected_codeblock = re.search(rb"\{window\.cdc.*?;\}", mm)
+            if not match_injected_codeblock:
+                logger.warning(
+                    "something went wrong patching the driver binary. could not find injection code block"
                 )
-                new_content = content.replace(target_bytes, new_target_bytes)
-                if new_content == content:
-                    logger.warning(
-                        "something went wrong patching the driver binary. could not find injection code block"
-                    )
-                else:
-                    logger.debug(
-                        "found block:\n%s\nreplacing with:\n%s"
-                        % (target_bytes, new_target_bytes)
-                    )
-                fh.seek(0)
-                fh.write(new_content)
+                return
+            target_bytes = match_injected_codeblock[0]
+            new_target_bytes = (
+                b'{console.log("undetected chromedriver 1337!")}'.ljust(
+                    len(target_bytes), b" "
+                )
+            )
+            if len(new_target_bytes) != len(target_bytes):
+                # patching is done in place, the binary may not change in size
+                logger.warning(
+                    "something went wrong patching the driver binary. injection code block too short"
+                )
+                return
+            logger.debug(
+                "found block:\n%s\nreplacing with:\n%s"
+                % (target_bytes, new_target_bytes)
+            )
+            # overwrite every occurrence of the block, and nothing else
+            pos = match_injected_codeblock.start()
+            while pos != -1:
+                mm[pos : pos + len(target_bytes)] = new_target_bytes
+                pos = mm.find(target_bytes, pos + len(target_bytes))
+            mm.flush()
+        info = {
+            "offset": match_injected_codeblock.start(),
+            "length": len(new_target_bytes),
+            "sha256": hashlib.sha256(new_target_bytes).hexdigest(),
+        }
+        self._write_patch_info(executable_path, info)
         logger.debug(
             "patching took us {:.2f} seconds".format(time.perf_counter() - start)
         )
+        return info
 
     def __repr__(self):
         return "{0:s}({1:s})".format(
@@ -404,20 +1323,10 @@ class Patcher(object):
             # if the driver binary is specified by user
             # we assume it is important enough to not delete it
             return
-        else:
-            timeout = 3  # stop trying after this many seconds
-            t = time.monotonic()
-            now = lambda: time.monotonic()
-            while now() - t > timeout:
-                # we don't want to wait until the end of time
-                try:
-                    if self.user_multi_procs:
-                        break
-                    os.unlink(self.executable_path)
-                    logger.debug("successfully unlinked %s" % self.executable_path)
-                    break
-                except (OSError, RuntimeError, PermissionError):
-                    time.sleep(0.01)
-                    continue
-                except FileNotFoundError:
-                    break
+        # this is only our own link to the cached master binary.
+        # when it is still in use (windows), leave it for a later cleanup
+        try:
+            os.unlink(self.executable_path)
+            logger.debug("successfully unlinked %s" % self.executable_path)
+        except (OSError, RuntimeError, AttributeError):
+            pass
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# this module is part of undetected_chromedriver
+
+import contextlib
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+logger = logging.getLogger(__name__)
+
+
+def _origin(url):
+    """returns the origin of an http(s) url, else None"""
+    url = urlsplit(url)
+    if url.scheme in ("http", "https") and url.netloc:
+        return "%s://%s" % (url.scheme, url.netloc)
+    return None
+
+
+class BrowserPool(object):
+    """
+    keeps a number of started Chrome instances ready to be leased, so a job
+    does not have to wait for the browser, driver and session to start.
+
+        pool = uc.BrowserPool(size=4, headless=True)
+        with pool.lease() as driver:
+            driver.get("https://nowsecure.nl")
+        pool.close()
+
+    a background thread starts new instances whenever the pool has less than
+    `size` of them (leased ones included). before an instance is handed out
+    it is health checked, and when it comes back its state is reset: extra
+    tabs are closed, cookies and the storage of every origin visited during
+    the lease are cleared, and it is navigated to about:blank. instances
+    failing either are quit and replaced.
+
+    visited origins are collected from the history of every tab, and (for
+    uc.Chrome) from the browser's devtools connection, which reports every
+    page and out of process frame as it navigates.
+    """
+
+    def __init__(self, size=2, factory=None, max_uses=None, **kw):
+        """
+        Args:
+            size: number of instances to keep (idle and leased)
+            factory: callable returning a new Chrome instance.
+                     None = uc.Chrome(**kw)
+            max_uses: replace an instance after it has been leased this many times.
+                      None = never
+            kw: keyword arguments to uc.Chrome, when no factory is given.
+                since a ChromeOptions object cannot be reused, pass a factory
+                to use custom options.
+        """
+        if factory is None:
+            if "options" in kw:
+                raise ValueError(
+                    "ChromeOptions cannot be reused, use a factory to pass options"
+                )
+
+            def factory():
+                from . import Chrome
+
+                return Chrome(**kw)
+
+        self.size = size
+        self.factory = factory
+        self.max_uses = max_uses
+        self._idle = []
+        self._leased = set()
+        self._uses = {}
+        # {driver: set of origins visited since its last reset}
+        self._origins = {}
+        self._starting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._replenish, name="uc-pool", daemon=True
+        )
+        self._thread.start()
+
+    @contextlib.contextmanager
+    def lease(self, timeout=None):
+        """
+        context manager which leases an instance, and returns it to the pool
+        when done. an instance is not returned (but replaced) when the block
+        raises an exception.
+        """
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        except BaseException:
+            self.release(driver, discard=True)
+            raise
+        else:
+            self.release(driver)
+
+    def acquire(self, timeout=None):
+        """
+        takes a healthy instance from the pool, waiting at most
+        `timeout` seconds (None = forever) for one to become available.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while not self._idle:
+                    if self._closed:
+                        raise RuntimeError("pool is closed")
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("no browser available within %s seconds" % timeout)
+                    self._cond.wait(remaining)
+                driver = self._idle.pop()
+                self._leased.add(driver)
+            if self._healthy(driver):
+                self._uses[driver] = self._uses.get(driver, 0) + 1
+                return driver
+            logger.debug("discarding unhealthy browser %s" % driver)
+            self._discard(driver)
+
+    def release(self, driver, discard=False):
+        """
+        returns a leased instance to the pool, after resetting its state.
+        when discard is True, or the reset fails, it is quit and replaced instead.
+        """
+        with self._cond:
+            if driver not in self._leased:
+                raise ValueError("%s is not leased from this pool" % driver)
+        worn_out = self.max_uses and self._uses.get(driver, 0) >= self.max_uses
+        if discard or worn_out or self._closed or not self._reset(driver):
+            self._discard(driver)
+            return
+        with self._cond:
+            self._leased.discard(driver)
+            self._idle.append(driver)
+            self._cond.notify_all()
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    @property
+    def leased(self):
+        return len(self._leased)
+
+    def close(self):
+        """quits all idle instances. leased ones are quit when released"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for driver in idle:
+            self._quit(driver)
+
+    def _replenish(self):
+        backoff = 1
+        while True:
+            with self._cond:
+                while not self._closed and (
+                    len(self._idle) + len(self._leased) + self._starting >= self.size
+                ):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                self._starting += 1
+            try:
+                driver = self.factory()
+            except Exception as e:
+                logger.warning("could not start browser for pool: %s" % e)
+                with self._cond:
+                    self._starting -= 1
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            backoff = 1
+            self._watch(driver)
+            with self._cond:
+                self._starting -= 1
+                if self._closed:
+                    closed = True
+                else:
+                    closed = False
+                    self._idle.append(driver)
+                    self._cond.notify_all()
+            if closed:
+                self._quit(driver)
+
+    @staticmethod
+    def _healthy(driver):
+        try:
+            process = driver.service.process
+            if process is not None and process.poll() is not None:
+                return False
+            return bool(driver.window_handles)
+        except Exception as e:
+            logger.debug("health check failed: %s" % e)
+            return False
+
+    def _watch(self, driver):
+        """
+        records the origin of every target (tab, out of process frame) the
+        browser of driver navigates, using the devtools connection of uc.Chrome
+        """
+        origins = self._origins.setdefault(driver, set())
+        try:
+            connection = driver.devtools
+        except Exception as e:
+            logger.debug("not watching the navigations of %s: %s" % (driver, e))
+            return
+
+        def visited(message):
+            origin = _origin(message["params"].get("targetInfo", {}).get("url", ""))
+            if origin:
+                self._origins.get(driver, origins).add(origin)
+
+        connection.add_listener("Target.targetCreated", visited)
+        connection.add_listener("Target.targetInfoChanged", visited)
+        try:
+            connection.send("Target.setDiscoverTargets", {"discover": True})
+        except Exception as e:
+            logger.debug("not watching the navigations of %s: %s" % (driver, e))
+
+    def _history(self, driver):
+        """returns the origins in the session history of the current tab"""
+        try:
+            entries = driver.execute_cdp_cmd("Page.getNavigationHistory", {})
+        except Exception as e:
+            logger.debug("could not get navigation history: %s" % e)
+            return set()
+        return {_origin(e.get("url", "")) for e in entries.get("entries", [])}
+
+    def _reset(self, driver):
+        try:
+            # swapped before anything else, so visits from now on count
+            # for the next lease
+            origins = self._origins.get(driver, set())
+            self._origins[driver] = set()
+            handles = driver.window_handles
+            for handle in reversed(handles):
+                driver.switch_to.window(handle)
+                origins |= self._history(driver)
+                origins.add(_origin(driver.current_url))
+                if handle != handles[0]:
+                    driver.close()
+            driver.switch_to.window(handles[0])
+            for origin in origins - {None}:
+                driver.execute_cdp_cmd(
+                    "Storage.clearDataForOrigin",
+                    {"origin": origin, "storageTypes": "all"},
+                )
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            logger.debug("could not reset browser state: %s" % e)
+            return False
+
+    def _discard(self, driver):
+        with self._cond:
+            self._leased.discard(driver)
+            self._uses.pop(driver, None)
+            self._origins.pop(driver, None)
+            # wakes up the replenisher
+            self._cond.notify_all()
+        self._quit(driver)
+
+    @staticmethod
+    def _quit(driver):
+        from . import Chrome
+
+        if isinstance(driver, Chrome):
+            # the slow part (profile removal) is left to the reaper
+            driver.quit(wait=False)
+        else:
+            # quitting takes a while, and nobody waits for it
+            threading.Thread(target=driver.quit, daemon=True).start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return "{0:s}(size={1:d}, idle={2:d}, leased={3:d})".format(
+            self.__class__.__name__, self.size, self.idle, self.leased
+        )
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# this module is part of undetected_chromedriver
+
+"""
+profile templates
+
+a fresh profile means Chrome does its first run setup on every launch: it
+writes its Preferences, initializes databases, caches, and so on. a template
+is a profile on which that has been done once (with prefs applied and the
+exit_type flag fixed), which is then cloned for every launch instead.
+
+    uc.create_profile_template("/path/to/template", headless=True)
+    driver = uc.Chrome(profile_template="/path/to/template")
+
+clones are made using copy-on-write (reflinks) when the filesystem supports
+it (btrfs, xfs, apfs, ...), and fall back to a regular copy otherwise.
+hardlinks are never used, since Chrome updates some of its files (sqlite
+databases) in place, which would write through to the template.
+"""
+
+import errno
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# files which belong to a running browser, and are never part of a template
+VOLATILE = (
+    "SingletonLock",
+    "SingletonCookie",
+    "SingletonSocket",
+    "lockfile",
+    "DevToolsActivePort",
+)
+
+if sys.platform.startswith("linux"):
+    import fcntl
+
+    FICLONE = 0x40049409
+
+    def _reflink(src, dst):
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+elif sys.platform == "darwin":
+    import ctypes
+    import ctypes.util
+
+    _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+    def _reflink(src, dst):
+        if _libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), src)
+
+else:
+    _reflink = None
+
+# errors meaning "cloning is not possible here" rather than an actual problem
+_NO_REFLINK = {
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOTTY,
+    errno.ENOSYS,
+    errno.EPERM,
+}
+
+
+def clone_profile(template, dest=None):
+    """
+    clones the profile template into dest (None = a new temporary folder)
+
+    :return: the path of the clone
+    """
+    template = os.path.normpath(os.path.abspath(template))
+    if not os.path.isdir(template):
+        raise FileNotFoundError(
+            "profile template %s does not exist, see create_profile_template()"
+            % template
+        )
+    dest = os.path.normpath(dest or tempfile.mkdtemp())
+    reflink = [_reflink is not None]
+
+    def copy(src, dst):
+        if reflink[0]:
+            try:
+                _reflink(src, dst)
+                shutil.copystat(src, dst)
+                return dst
+            except OSError as e:
+                if e.errno not in _NO_REFLINK:
+                    raise
+                logger.debug(
+                    "reflinks not supported for %s (%s), copying" % (dest, e)
+                )
+                reflink[0] = False
+                try:
+                    os.unlink(dst)
+                except OSError:
+                    pass
+        return shutil.copy2(src, dst)
+
+    start = time.perf_counter()
+    shutil.copytree(
+        template,
+        dest,
+        symlinks=True,
+        ignore=shutil.ignore_patterns(*VOLATILE),
+        copy_function=copy,
+        dirs_exist_ok=True,
+    )
+    logger.debug(
+        "cloned profile template %s to %s in %.3fs (%s)"
+        % (
+            template,
+            dest,
+            time.perf_counter() - start,
+            "reflink" if reflink[0] else "copy",
+        )
+    )
+    return dest
+
+
+def _merge(a, b):
+    """
+    merges b into a, leaf values in a are overwritten with values from b
+
+    :return: whether a changed
+    """
+    changed = False
+    for key, value in b.items():
+        if isinstance(a.get(key), dict) and isinstance(value, dict):
+            changed = _merge(a[key], value) or changed
+        elif key not in a or a[key] != value:
+            a[key] = value
+            changed = True
+    return changed
+
+
+def update_preferences(user_data_dir, prefs=None, fix_exit_type=True):
+    """
+    merges prefs (a nested dict) into the profile's Default/Preferences, and
+    fixes the exit_type flag to prevent the tab-restore nag, in one pass.
+
+    the file is replaced atomically, so a crash never leaves a half written
+    one behind (which makes the browser do a slow profile recovery). when
+    nothing changes, nothing is written.
+
+    :return: whether the file was written. an unreadable (or corrupt)
+             file is left alone
+    """
+    default_path = os.path.join(user_data_dir, "Default")
+    prefs_file = os.path.join(default_path, "Preferences")
+    try:
+        with open(prefs_file, encoding="latin1", mode="r") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        if not prefs:
+            return False
+        config = {}
+    except (OSError, ValueError) as e:
+        # rewriting it would lose the settings of a persistent profile
+        logger.warning("not updating unreadable %s: %s" % (prefs_file, e))
+        return False
+
+    changed = bool(prefs) and _merge(config, prefs)
+    if fix_exit_type:
+        profile = config.get("profile")
+        if isinstance(profile, dict) and profile.get("exit_type") is not None:
+            # fixing the restore-tabs-nag
+            profile["exit_type"] = None
+            changed = True
+            logger.debug("fixed exit_type flag")
+    if not changed:
+        return False
+
+    os.makedirs(default_path, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(
+        prefix="Preferences.", suffix=".tmp", dir=default_path
+    )
+    try:
+        with open(fd, encoding="latin1", mode="w") as f:
+            json.dump(config, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, prefs_file)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return True
+
+
+def fix_exit_type(user_data_dir):
+    """fixes the exit_type flag to prevent the tab-restore nag"""
+    return update_preferences(user_data_dir)
+
+
+def create_profile_template(path, options=None, timeout=15, **kw):
+    """
+    creates a profile template at path, by starting the browser once on a new
+    profile and quitting it. prefs given in options (see ChromeOptions.add_experimental_option)
+    are applied to it, and its exit_type flag is fixed.
+
+    the template is created next to path and moved into place when complete,
+    so other processes never clone a half-finished one. if path already
+    exists, it is left alone.
+
+    Args:
+        path: where to create the template
+        options: ChromeOptions used for the run creating the template
+        timeout: seconds to wait for the browser to shut down
+        kw: keyword arguments to uc.Chrome
+
+    :return: path
+    """
+    from . import Chrome
+
+    path = os.path.normpath(os.path.abspath(path))
+    if os.path.isdir(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    build = tempfile.mkdtemp(
+        prefix=".%s-" % os.path.basename(path), dir=os.path.dirname(path)
+    )
+    try:
+        driver = Chrome(options=options, user_data_dir=build, **kw)
+        try:
+            driver.get("about:blank")
+        finally:
+            driver.quit()
+
+        # a browser shutting down still writes to its profile. it removes
+        # the lock as one of the last things
+        lock = os.path.join(build, "SingletonLock" if os.name != "nt" else "lockfile")
+        deadline = time.monotonic() + timeout
+        while os.path.lexists(lock) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if os.path.lexists(lock):
+            logger.warning(
+                "browser did not shut down within %ds, template might be incomplete"
+                % timeout
+            )
+
+        fix_exit_type(build)
+        for name in VOLATILE:
+            try:
+                os.unlink(os.path.join(build, name))
+            except OSError:
+                pass
+        try:
+            os.rename(build, path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+            # created by someone else in the meantime
+            logger.debug("profile template %s created concurrently" % path)
+        else:
+            logger.debug("created profile template %s" % path)
+    finally:
+        shutil.rmtree(build, ignore_errors=True)
+    return path
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# this module is part of undetected_chromedriver
+
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile(object):
+    """
+    per phase timings (in seconds, from a monotonic clock) of a Chrome startup.
+
+    phases are recorded lap-wise: lap(name) attributes the time passed since
+    the previous lap to `name`. recording the same phase twice adds up.
+
+        >>> driver = uc.Chrome()
+        >>> driver.startup_profile.phases
+        {'find_browser': 0.0012, 'patcher': 0.0043, 'options': 0.0009, ...}
+        >>> driver.startup_profile.total
+        1.2871
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.total = None
+        self._last = self.started
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self._last)
+        self._last = now
+
+    def add(self, name, seconds):
+        """records a duration measured elsewhere, without affecting the laps"""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @property
+    def finished(self):
+        return self.total is not None
+
+    def finish(self, hook=None):
+        """
+        stops recording, and passes this profile to hook (a callable accepting
+        1 parameter) if given. exceptions raised by the hook are logged and ignored.
+        """
+        if self.finished:
+            return
+        self.total = time.perf_counter() - self.started
+        logger.debug("startup profile: %s" % self)
+        if hook:
+            try:
+                hook(self)
+            except Exception as e:
+                logger.warning("startup profile hook failed: %s" % e)
+
+    def as_dict(self):
+        return {"total": self.total, "phases": dict(self.phases)}
+
+    def __repr__(self):
+        phases = ", ".join("%s=%.3fs" % (k, v) for k, v in self.phases.items())
+        total = "%.3fs" % self.total if self.finished else "unfinished"
+        return "{0:s}(total={1:s}, {2:s})".format(
+            self.__class__.__name__, total, phases
+        )
@@ -2,91 +2,646 @@
 # this module is part of undetected_chromedriver
 
 import asyncio
+import collections
 import json
+import itertools
 import logging
+import queue
 import threading
 
+try:
+    from websockets.asyncio.client import connect
+except ImportError:  # websockets < 13
+    from websockets.client import connect
+
 
 logger = logging.getLogger(__name__)
 
+# the domains of the devtools protocol, as the browser spells them. handlers
+# are case insensitive ("network.dataReceived"), the browser is not
+CDP_DOMAINS = {
+    name.lower(): name
+    for name in """
+        Accessibility Animation Audits Autofill BackgroundService
+        BluetoothEmulation Browser CacheStorage Cast Console CSS Debugger
+        DeviceAccess DeviceOrientation DOM DOMDebugger DOMSnapshot DOMStorage
+        Emulation EventBreakpoints Extensions FedCm Fetch FileSystem
+        HeadlessExperimental HeapProfiler IndexedDB Input Inspector IO
+        LayerTree Log Media Memory Network Overlay Page Performance
+        PerformanceTimeline Preload Profiler PWA Runtime Schema Security
+        ServiceWorker Storage SystemInfo Target Tethering Tracing WebAudio
+        WebAuthn
+    """.split()
+}
+
+# domains without an enable method. their events are switched on by other
+# commands (Target.setDiscoverTargets, Tracing.start, ...), if at all
+NO_ENABLE = set(
+    """
+    BackgroundService Browser CacheStorage DeviceOrientation DOMDebugger
+    Emulation EventBreakpoints Extensions FileSystem Input IO Memory PWA
+    Schema Storage SystemInfo Target Tethering Tracing
+    """.split()
+)
+
+
+class Dispatcher(object):
+    """
+    hands messages to their handlers on a pool of worker threads, so slow
+    handlers neither stall receiving events nor each other.
+
+    messages are put in lanes by key (the event method), one lane per worker:
+    messages with the same key are handled one at a time, in the order
+    they came in. each lane holds at most maxsize / workers messages.
+    what happens when a lane is full depends on overflow:
+
+        "block"         put waits for room (backpressure to the sender)
+        "drop_oldest"   the oldest message in the lane makes room
+        "sample"        only every sample_every'th message is let in,
+                        replacing the oldest one, the others are dropped
+    """
+
+    OVERFLOW = ("block", "drop_oldest", "sample")
+
+    def __init__(self, workers=2, maxsize=10000, overflow="block", sample_every=10):
+        if overflow not in self.OVERFLOW:
+            raise ValueError(
+                "overflow must be one of %s, not %r"
+                % (", ".join(self.OVERFLOW), overflow)
+            )
+        workers = max(1, workers)
+        self.overflow = overflow
+        self.sample_every = max(1, sample_every)
+        self.capacity = max(1, -(-maxsize // workers))
+        self._lanes = [collections.deque() for _ in range(workers)]
+        self._lock = threading.Lock()
+        self._not_empty = [threading.Condition(self._lock) for _ in range(workers)]
+        self._not_full = threading.Condition(self._lock)
+        self._threads = []
+        self._closed = False
+        self._overflowed = 0
+        self.max_depth = 0
+        self.handled = 0
+        self.dropped = 0
+        self.blocked = 0
+
+    @property
+    def depth(self):
+        """messages waiting to be handled"""
+        return sum(len(lane) for lane in self._lanes)
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {
+                "depth": self.depth,
+                "max_depth": self.max_depth,
+                "handled": self.handled,
+                "dropped": self.dropped,
+                "blocked": self.blocked,
+            }
+
+    def put(self, key, handler, message, block=True):
+        """
+        queues handler(message)
+
+        :return: False when the message was dropped
+        :raises queue.Full: the lane is full, overflow is "block" and block
+                            is False
+        """
+        i = hash(key) % len(self._lanes)
+        lane = self._lanes[i]
+        with self._lock:
+            if self._closed:
+                return False
+            if not self._threads:
+                self._start()
+            if len(lane) >= self.capacity:
+                if self.overflow == "block":
+                    if not block:
+                        raise queue.Full
+                    self.blocked += 1
+                    while len(lane) >= self.capacity and not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        return False
+                elif self.overflow == "drop_oldest":
+                    lane.popleft()
+                    self.dropped += 1
+                else:
+                    self._overflowed += 1
+                    self.dropped += 1
+                    if self._overflowed % self.sample_every:
+                        return False
+                    lane.popleft()
+            lane.append((handler, message))
+            depth = self.depth
+            if depth > self.max_depth:
+                self.max_depth = depth
+            self._not_empty[i].notify()
+        return True
+
+    def close(self):
+        """stops the workers once they finish the message at hand. queued
+        messages are discarded."""
+        with self._lock:
+            self._closed = True
+            for lane in self._lanes:
+                lane.clear()
+            for condition in self._not_empty:
+                condition.notify_all()
+            self._not_full.notify_all()
+
+    def _start(self):
+        for i in range(len(self._lanes)):
+            thread = threading.Thread(
+                target=self._work,
+                args=(i,),
+                name="uc-reactor-handler-%d" % i,
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self, i):
+        lane = self._lanes[i]
+        not_empty = self._not_empty[i]
+        while True:
+            with self._lock:
+                while not lane and not self._closed:
+                    not_empty.wait()
+                if self._closed:
+                    return
+                handler, message = lane.popleft()
+                self._not_full.notify_all()
+            try:
+                handler(message)
+            except Exception as e:
+                logger.warning(
+                    "handler for %s failed: %s" % (message.get("method"), e)
+                )
+            with self._lock:
+                self.handled += 1
+
+
+class Subscriptions(object):
+    """
+    the handlers subscribed to cdp events. an event is given by its method
+    ("Network.requestWillBeSent"), by its domain ("Network.*"), or as "*"
+    for all events, case insensitive. an event can have any number of
+    handlers, each with an optional predicate(params) deciding whether a
+    particular event is passed on.
+
+    the handlers of a method are looked up once, then kept in an index by
+    method until the subscriptions change, so dispatching an event takes a
+    single dict lookup.
+    """
+
+    def __init__(self, default_domains=("Network", "Page")):
+        self.default_domains = tuple(default_domains)
+        self._lock = threading.Lock()
+        # [(pattern, callback, predicate)], pattern is lowercased
+        self._subscriptions = []
+        # {domain.lower(): domain} as it was written when subscribing, for
+        # domains missing from CDP_DOMAINS
+        self._names = {}
+        # {lowercased method: ((callback, predicate), ...)}
+        self._index = {}
+
+    def add(self, event, callback, predicate=None):
+        domain = event.split(".")[0]
+        with self._lock:
+            self._subscriptions.append((event.lower(), callback, predicate))
+            if event != "*":
+                self._names.setdefault(domain.lower(), domain)
+            self._index = {}
+
+    def remove(self, event, callback):
+        """
+        :return: False if callback was not subscribed to event
+        """
+        pattern = event.lower()
+        with self._lock:
+            for i, (p, cb, _) in enumerate(self._subscriptions):
+                if p == pattern and cb == callback:
+                    del self._subscriptions[i]
+                    self._index = {}
+                    return True
+        return False
+
+    def clear(self):
+        with self._lock:
+            self._subscriptions = []
+            self._index = {}
+
+    def match(self, method):
+        """
+        :return: tuple of (callback, predicate) subscribed to given method
+        """
+        key = method.lower()
+        index = self._index
+        try:
+            return index[key]
+        except KeyError:
+            pass
+        with self._lock:
+            domain = key.split(".")[0] + ".*"
+            found = tuple(
+                (callback, predicate)
+                for pattern, callback, predicate in self._subscriptions
+                if pattern == key or pattern == domain or pattern == "*"
+            )
+            # unless the subscriptions changed in the meantime
+            if index is self._index:
+                index[key] = found
+        return found
+
+    def domains(self):
+        """
+        :return: the set of domains having subscribers, which need enabling
+                 in the browser, spelled the way the browser does. "*"
+                 stands for the default domains
+        """
+        with self._lock:
+            domains = set()
+            for pattern, _, _ in self._subscriptions:
+                if pattern == "*":
+                    domains.update(self.default_domains)
+                else:
+                    domain = pattern.split(".")[0]
+                    domain = CDP_DOMAINS.get(domain, self._names.get(domain, domain))
+                    domains.add(domain)
+            return domains - NO_ENABLE
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def __iter__(self):
+        return iter([pattern for pattern, _, _ in self._subscriptions])
+
+    def __contains__(self, event):
+        return any(p == event.lower() for p, _, _ in self._subscriptions)
+
+    def __repr__(self):
+        return "{0:s}({1!r})".format(self.__class__.__name__, list(self))
+
+
+class ReactorHub(object):
+    """
+    one thread running one event loop, plus one pool of handler threads,
+    serving the reactors of all drivers in the process. a reactor registers
+    when its driver starts and unregisters when it quits. the thread and
+    the pool start along with the first reactor, and stay (idle) after the
+    last one is gone.
+
+    the handler pool is configured by the class attributes below, before the
+    first reactor starts. see Dispatcher for the overflow policies. "block"
+    pauses reading the events of the driver with a full lane, the others
+    carry on.
+    """
+
+    workers = 4
+    maxsize = 10000
+    overflow = "block"
+
+    def __init__(self):
+        self.loop = None
+        self.dispatcher = None
+        self._thread = None
+        self._lock = threading.Lock()
+        # {reactor: Future of its Reactor.run()}
+        self._tasks = {}
+
+    @property
+    def reactors(self):
+        with self._lock:
+            return list(self._tasks)
+
+    def register(self, reactor):
+        with self._lock:
+            if reactor in self._tasks:
+                return
+            if self._thread is None:
+                self.loop = asyncio.new_event_loop()
+                self.dispatcher = Dispatcher(self.workers, self.maxsize, self.overflow)
+                self._thread = threading.Thread(
+                    target=self._run, name="uc-reactor-hub", daemon=True
+                )
+                self._thread.start()
+            self._tasks[reactor] = asyncio.run_coroutine_threadsafe(
+                reactor.run(), self.loop
+            )
+
+    def unregister(self, reactor):
+        with self._lock:
+            task = self._tasks.pop(reactor, None)
+        if task is not None:
+            task.cancel()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+
+hub = ReactorHub()
 
-class Reactor(threading.Thread):
-    def __init__(self, driver: "Chrome"):
-        super().__init__()
 
+class Reactor(object):
+    """
+    delivers the cdp events of a driver to the handlers added using
+    add_event_handler. reactors do not have threads of their own: they
+    run on the ReactorHub of the process, and their handlers on its pool.
+    """
+
+    # receive events as they happen, over the devtools websocket of the
+    # browser. when False, the performance log of chromedriver is polled
+    # instead, once a second (chromedriver only keeps it in that case)
+    push = True
+
+    # domains a "*" handler enables. the same ones the performance log covers
+    default_domains = ("Network", "Page")
+
+    def __init__(self, driver: "Chrome", push=None):
         self.driver = driver
-        self.loop = asyncio.new_event_loop()
+        self.hub = hub
 
         self.lock = threading.Lock()
         self.event = threading.Event()
-        self.daemon = True
-        self.handlers = {}
+        self.handlers = Subscriptions(self.default_domains)
+        if push is not None:
+            self.push = push
 
-    def add_event_handler(self, method_name, callback: callable):
+        # why the event stream stopped, if it failed
+        self.error = None
+        self._ws = None
+        self._ids = itertools.count(1)
+        # {id: (method, asyncio.Future)}
+        self._pending = {}
+        # attached page sessions
+        self._sessions = set()
+        # {(session_id, domain)} enabled already
+        self._enabled = set()
+
+    def add_event_handler(self, method_name, callback: callable, predicate=None):
         """
 
         Parameters
         ----------
         event_name: str
-            example "Network.responseReceived"
+            example "Network.responseReceived", or "Network.*" for all
+            events of the Network domain, or "*" for all events
 
         callback: callable
             callable which accepts 1 parameter: the message object dictionary
 
+        predicate: callable, optional
+            callable which accepts 1 parameter: the params of the event,
+            and returns whether callback should get it. it runs while
+            receiving events, so keep it cheap.
+
         Returns
         -------
 
         """
-        with self.lock:
-            self.handlers[method_name.lower()] = callback
+        self.handlers.add(method_name, callback, predicate)
+        self._update_domains()
+
+    def remove_event_handler(self, method_name, callback: callable):
+        removed = self.handlers.remove(method_name, callback)
+        self._update_domains()
+        return removed
+
+    def clear_event_handlers(self):
+        self.handlers.clear()
+        self._update_domains()
+
+    def _update_domains(self):
+        if self._ws is not None:
+            asyncio.run_coroutine_threadsafe(self._sync_domains(), self.hub.loop)
 
     @property
     def running(self):
         return not self.event.is_set()
 
-    def run(self):
+    @property
+    def loop(self):
+        return self.hub.loop
+
+    @property
+    def stats(self):
+        """queue depth and drop counters of the (shared) handler pool"""
+        return self.hub.dispatcher.stats if self.hub.dispatcher else {}
+
+    def start(self):
+        self.event.clear()
+        self.hub.register(self)
+
+    def stop(self):
+        self.event.set()
+        self.hub.unregister(self)
+
+    async def run(self):
         try:
-            asyncio.set_event_loop(self.loop)
-            self.loop.run_until_complete(self.listen())
+            if self.push:
+                await self.listen_push()
+            else:
+                await self.listen()
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
-            logger.warning("Reactor.run() => %s", e)
+            self.error = e
+            logger.error(
+                "cdp events of %s stopped: %s. set Reactor.push = False to poll "
+                "the performance log instead" % (self.driver, e)
+            )
+
+    async def _dispatch(self, message):
+        method = message.get("method")
+        # one lane per method and driver
+        key = (id(self), method)
+        for handler, predicate in self.handlers.match(method):
+            if predicate is not None:
+                try:
+                    if not predicate(message.get("params", {})):
+                        continue
+                except Exception as e:
+                    logger.debug("predicate for %s failed: %s" % (method, e))
+                    continue
+            try:
+                self.hub.dispatcher.put(key, handler, message, block=False)
+            except queue.Full:
+                # wait for room without holding up the other drivers
+                await self.loop.run_in_executor(
+                    None, self.hub.dispatcher.put, key, handler, message
+                )
+
+    async def listen_push(self):
+        """
+        streams the events of every page of the browser over its devtools
+        websocket. only the domains someone handles are enabled, so the
+        browser does not emit anything else.
+        returns when the reactor stops.
+        """
+        from .connection import _CONNECT_KW
+        from .connection import CDPError
+        from .readiness import fetch_json
+
+        loop = asyncio.get_running_loop()
+        while self.running:
+            version = await loop.run_in_executor(
+                None,
+                fetch_json,
+                "http://%s/json/version" % self.driver.options.debugger_address,
+            )
+            async with connect(
+                version["webSocketDebuggerUrl"],
+                max_size=None,
+                compression=None,
+                # the asyncio client of every version knows ping_interval
+                **dict(_CONNECT_KW, ping_interval=None),
+            ) as ws:
+                self._ws = ws
+                with self.lock:
+                    self._sessions.clear()
+                    self._enabled.clear()
+                reader = asyncio.ensure_future(self._read(ws, CDPError))
+                try:
+                    # reports the existing targets first, then every new one
+                    await self._command("Target.setDiscoverTargets", {"discover": True})
+                    await reader
+                except ConnectionError as e:
+                    logger.debug("event stream interrupted: %s" % e)
+                finally:
+                    self._ws = None
+                    reader.cancel()
+                    pending, self._pending = self._pending, {}
+                    for method, future in pending.values():
+                        if not future.done():
+                            future.set_exception(
+                                ConnectionError("%s: connection closed" % method)
+                            )
+
+    async def _command(self, method, params=None, session_id=None):
+        if self._ws is None:
+            raise ConnectionError("%s: not connected" % method)
+        message = {"id": next(self._ids), "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message["id"]] = (method, future)
+        await self._ws.send(json.dumps(message))
+        return await future
+
+    async def _read(self, ws, error_cls):
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                if "id" in message:
+                    method, future = self._pending.pop(message["id"], (None, None))
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(error_cls(method, message["error"]))
+                    else:
+                        future.set_result(message.get("result", {}))
+                elif message.get("sessionId") in self._sessions:
+                    await self._dispatch(message)
+                elif message.get("method") == "Target.targetCreated":
+                    info = message["params"].get("targetInfo", {})
+                    if info.get("type") == "page":
+                        asyncio.ensure_future(self._attach(info["targetId"]))
+                elif message.get("method") == "Target.detachedFromTarget":
+                    session_id = message["params"].get("sessionId")
+                    with self.lock:
+                        self._sessions.discard(session_id)
+                        self._enabled = {
+                            e for e in self._enabled if e[0] != session_id
+                        }
+        except Exception as e:
+            if self.running:
+                logger.debug("event stream of %s ended: %s" % (self.driver, e))
+
+    async def _attach(self, target_id):
+        try:
+            result = await self._command(
+                "Target.attachToTarget", {"targetId": target_id, "flatten": True}
+            )
+        except Exception as e:
+            # the target was gone already
+            logger.debug("attaching to %s failed: %s" % (target_id, e))
+            return
+        with self.lock:
+            self._sessions.add(result["sessionId"])
+        await self._sync_domains()
+
+    async def _sync_domains(self):
+        """
+        enables the domains having handlers on the attached sessions, and
+        disables those which do not have any anymore
+        """
+        wanted = self.handlers.domains()
+        with self.lock:
+            enable = [
+                (session_id, domain)
+                for session_id in self._sessions
+                for domain in wanted
+                if (session_id, domain) not in self._enabled
+            ]
+            disable = [e for e in self._enabled if e[1] not in wanted]
+            self._enabled.update(enable)
+            self._enabled.difference_update(disable)
+        results = await asyncio.gather(
+            *(self._command(domain + ".enable", None, s) for s, domain in enable),
+            *(self._command(domain + ".disable", None, s) for s, domain in disable),
+            return_exceptions=True,
+        )
+        for i, result in enumerate(results):
+            if not isinstance(result, Exception):
+                continue
+            if i < len(enable):
+                # no events of this domain will arrive
+                logger.warning(
+                    "cannot enable %s, its handlers will not be called: %s"
+                    % (enable[i][1], result)
+                )
+            else:
+                logger.debug("%s" % result)
 
     async def _wait_service_started(self):
+        # the service is down while the driver reconnects. poll it with a
+        # short backoff, instead of sleeping a fixed amount of time
+        interval = 0.005
         while True:
             with self.lock:
                 if (
                     getattr(self.driver, "service", None)
                     and getattr(self.driver.service, "process", None)
-                    and self.driver.service.process.poll()
+                    and self.driver.service.process.poll() is not None
                 ):
-                    await asyncio.sleep(self.driver._delay or 0.25)
+                    await asyncio.sleep(interval)
+                    interval = min(interval * 2, 0.25)
                 else:
                     break
 
+    def _get_log(self):
+        with self.lock:
+            return self.driver.get_log("performance")
+
     async def listen(self):
         while self.running:
             await self._wait_service_started()
             await asyncio.sleep(1)
 
             try:
-                with self.lock:
-                    log_entries = self.driver.get_log("performance")
+                # a request to chromedriver, keep it off the shared loop
+                log_entries = await self.loop.run_in_executor(None, self._get_log)
 
                 for entry in log_entries:
                     try:
                         obj_serialized: str = entry.get("message")
                         obj = json.loads(obj_serialized)
                         message = obj.get("message")
-                        method = message.get("method")
-
-                        if "*" in self.handlers:
-                            await self.loop.run_in_executor(
-                                None, self.handlers["*"], message
-                            )
-                        elif method.lower() in self.handlers:
-                            await self.loop.run_in_executor(
-                                None, self.handlers[method.lower()], message
-                            )
+                        await self._dispatch(message)
 
                         # print(type(message), message)
                     except Exception as e:
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# this module is part of undetected_chromedriver
+
+"""
+readiness probes for the browser (devtools) and the driver service,
+used instead of sleeping a fixed amount of time and hoping it was enough.
+"""
+
+import json
+import logging
+import time
+from urllib.error import HTTPError
+from urllib.error import URLError
+import urllib.request
+
+
+logger = logging.getLogger(__name__)
+
+# never go through a proxy to reach a local endpoint
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+def wait_until_ready(url, check=None, timeout=30, alive=None):
+    """
+    polls url until it answers with json for which check (a callable
+    accepting 1 parameter) returns True. the interval between attempts
+    starts at 5ms and doubles up to 250ms.
+
+    Args:
+        url: the url to poll
+        check: None = any answer will do
+        timeout: seconds to wait at most
+        alive: callable returning False when the process behind url died,
+               to stop waiting immediately
+
+    :return: seconds waited
+    :raises TimeoutError: not ready within timeout
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    interval = 0.005
+    while True:
+        remaining = deadline - time.perf_counter()
+        try:
+            with _opener.open(url, timeout=max(0.05, min(1, remaining))) as resp:
+                if check is None or check(json.load(resp)):
+                    return time.perf_counter() - start
+        except (HTTPError, URLError, OSError, ValueError) as e:
+            logger.debug("%s not ready: %s" % (url, e))
+        if alive is not None and not alive():
+            raise RuntimeError("process behind %s exited" % url)
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise TimeoutError("%s not ready within %s seconds" % (url, timeout))
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, 0.25)
+
+
+def fetch_json(url, timeout=10):
+    """fetches and decodes a json document from a local endpoint"""
+    with _opener.open(url, timeout=timeout) as resp:
+        return json.load(resp)
+
+
+def wait_for_browser(debugger_address, timeout=30, alive=None):
+    """waits until the devtools endpoint at debugger_address (host:port) answers"""
+    return wait_until_ready(
+        "http://%s/json/version" % debugger_address, timeout=timeout, alive=alive
+    )
+
+
+def wait_for_service(service_url, timeout=30, alive=None):
+    """waits until the chromedriver at service_url reports it is ready"""
+    return wait_until_ready(
+        service_url.rstrip("/") + "/status",
+        check=lambda status: (status.get("value") or {}).get("ready", True),
+        timeout=timeout,
+        alive=alive,
+    )
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# this module is part of undetected_chromedriver
+
+"""
+cleans up after quit browsers in the background: waits for the browser
+process to exit, then removes its temporary profile. used by
+Chrome.quit(wait=False), so the caller does not have to wait for it.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+
+from .patcher import IS_POSIX
+from .patcher import _pid_alive
+
+
+logger = logging.getLogger(__name__)
+
+
+def remove_profile(path, retries=5):
+    """removes a profile folder, retrying a few times since files may still be in use"""
+    for _ in range(retries):
+        try:
+            shutil.rmtree(path, ignore_errors=False)
+        except FileNotFoundError:
+            pass
+        except (RuntimeError, OSError, PermissionError) as e:
+            logger.debug(
+                "When removing the temp profile, a %s occured: %s\nretrying..."
+                % (e.__class__.__name__, e)
+            )
+        else:
+            logger.debug("successfully removed %s" % path)
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def _exited(pid):
+    if IS_POSIX:
+        try:
+            # reaps it as well, when it is our child
+            done, _ = os.waitpid(pid, os.WNOHANG)
+            if done == pid:
+                return True
+        except ChildProcessError:
+            pass
+    return not _pid_alive(pid)
+
+
+class Reaper(object):
+    """
+    a single background thread doing the cleanup jobs, in order.
+
+    the queue is bounded: when it is full, submit() blocks until there is
+    room, so cleanup cannot fall behind indefinitely. pending jobs are
+    flushed when the interpreter exits.
+    """
+
+    # seconds to wait for a browser to exit before removing its profile anyway
+    exit_timeout = 10
+
+    def __init__(self, maxsize=32):
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, pid=None, path=None):
+        """
+        schedules waiting for process pid to exit, and removing path afterwards.
+        either can be None.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="uc-reaper", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+        self._queue.put((pid, path))
+
+    @property
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def flush(self, timeout=30):
+        """
+        waits at most timeout seconds for all submitted jobs to finish
+
+        :return: True when all are done
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(
+                        "%d cleanup jobs still pending" % self._queue.unfinished_tasks
+                    )
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            pid, path = self._queue.get()
+            try:
+                self._reap(pid, path)
+            except Exception as e:
+                logger.warning("cleanup of %s failed: %s" % (path or pid, e))
+            finally:
+                self._queue.task_done()
+
+    def _reap(self, pid, path):
+        if pid:
+            deadline = time.monotonic() + self.exit_timeout
+            interval = 0.01
+            while not _exited(pid):
+                if time.monotonic() > deadline:
+                    logger.debug("process %d did not exit in time" % pid)
+                    break
+                time.sleep(interval)
+                interval = min(interval * 2, 0.25)
+        if path:
+            remove_profile(path)
+
+
+reaper = Reaper()